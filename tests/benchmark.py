@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of benchmark.py                                      │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├──┐FUNCTIONS
+# │  ├── SYNTHETIC INPUTS
+# │  ├── MEASUREMENTS
+# │  └── MAIN
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# accept arguments
+import argparse
+
+# machine-readable report
+import json
+
+# temporary input files
+import tempfile
+
+# timings
+import time
+
+# capture cli output
+from io import StringIO
+from contextlib import redirect_stderr, redirect_stdout
+
+# fake command line
+from unittest.mock import patch
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# modules to measure
+from toc.toc import Toc
+from toc.cli import main
+
+# peak memory, not available on every platform
+try:
+    import resource
+except ImportError:
+    resource = None  # type: ignore[assignment]
+
+# ################################################################ FUNCTIONS
+# ################################ SYNTHETIC INPUTS
+
+
+def generate(family: str, lines: int) -> tuple[str, str]:
+    # return the extension and the content of a file with roughly this many lines
+    # a heading every 10 lines, cycling through the first three levels
+    sections = max(1, lines // 10)
+    filler = "lorem ipsum dolor sit amet, consectetur adipiscing elit\n" * 8
+    chunks = []
+    for i in range(sections):
+        level = i % 3 + 1
+        match family:
+            case "generic":
+                extension = "py"
+                heading = f"# {'#' * 2 ** (7 - level)} Heading {i}\n\n"
+                body = filler.replace("lorem", "# lorem")
+            case "markdown":
+                extension = "md"
+                heading = f"{'#' * level} Heading {i}\n\n"
+                body = filler
+            case "html":
+                extension = "html"
+                heading = f'<h{level} id="h{i}">Heading <b>{i}</b></h{level}>\n'
+                body = f"<p>\n{filler}</p>\n"
+            case "rst":
+                extension = "rst"
+                heading = f"Heading {i}\n{'#*='[level - 1] * 12}\n\n"
+                body = filler
+            case "latex":
+                extension = "tex"
+                heading = f"\\{'sub' * (level - 1)}section{{Heading {i}}}\n\n"
+                body = filler
+            case "man":
+                extension = "1"
+                heading = f'.{"TH SH SS".split()[level - 1]} "Heading {i}"\n'
+                body = filler
+            case "perl":
+                extension = "pl"
+                heading = f"=head{level} Heading {i}\n\n"
+                body = filler
+            case _:
+                raise ValueError(f'Unknown parser family "{family}"')
+        chunks.append(heading + body)
+    return extension, "".join(chunks)
+
+
+# ################################ MEASUREMENTS
+
+
+def best_of(repeat: int, function) -> float:
+    # return the fastest of several runs, as the others were slowed down by something else
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def rate(count: float, seconds: float) -> float:
+    return round(count / seconds, 3) if seconds > 0 else 0.0
+
+
+def peak_rss() -> int | None:
+    # peak resident set size in bytes
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def new_toc(inputFile: Path, data: str | None = None) -> Toc:
+    t = Toc(inputFile)
+    t.set_character()
+    # preloaded documents measure parsing alone, without reading the file
+    t._data = data
+    return t
+
+
+def bench_family(family: str, lines: int, repeat: int, workdir: Path) -> dict:
+    # measure each phase on a single file of this family
+    extension, data = generate(family, lines)
+    size = len(data.encode())
+    inputFile = workdir / f"{family}.{extension}"
+    inputFile.write_text(data)
+    headings = new_toc(inputFile, data)._toc_headings()
+
+    def generate_toc():
+        new_toc(inputFile, data)._generate_toc()
+
+    def prettify_connectors():
+        new_toc(inputFile)._prettify_connectors(headings)
+
+    def to_file():
+        # start from the file without toc every time
+        inputFile.write_text(data)
+        with redirect_stderr(StringIO()):
+            new_toc(inputFile).to_file()
+
+    result: dict = {"extension": extension, "bytes": size, "headings": len(headings)}
+    for name, function in [
+        ("_generate_toc", generate_toc),
+        ("_prettify_connectors", prettify_connectors),
+        ("to_file", to_file),
+    ]:
+        seconds = best_of(repeat, function)
+        result[name] = {
+            "seconds": round(seconds, 6),
+            "files_per_second": rate(1, seconds),
+            "mb_per_second": rate(size / 1e6, seconds),
+        }
+    return result
+
+
+def bench_cli(
+    families: list[str], files: int, lines: int, jobs: int, repeat: int, workdir: Path
+) -> dict:
+    # measure the command line over many files, cycling through the parser families
+    paths = []
+    size = 0
+    for i in range(files):
+        extension, data = generate(families[i % len(families)], lines)
+        path = workdir / "cli" / f"{i}.{extension}"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(data)
+        paths.append(str(path))
+        size += len(data.encode())
+    argv = ["toc", "--no-cache", "-j", str(jobs)] + paths
+
+    def cli():
+        with (
+            patch.object(sys, "argv", argv),
+            redirect_stdout(StringIO()),
+            redirect_stderr(StringIO()),
+        ):
+            main()
+
+    seconds = best_of(repeat, cli)
+    return {
+        "files": files,
+        "jobs": jobs,
+        "bytes": size,
+        "seconds": round(seconds, 6),
+        "files_per_second": rate(files, seconds),
+        "mb_per_second": rate(size / 1e6, seconds),
+    }
+
+
+# ################################ MAIN
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog="benchmark",
+        description="Measure toc parsers and command line throughput, printing a json report",
+    )
+    families = ["generic", "markdown", "html", "rst", "latex", "man", "perl"]
+    parser.add_argument(
+        "-p",
+        "--parsers",
+        nargs="+",
+        choices=families,
+        default=families,
+        help="parser families to measure",
+    )
+    parser.add_argument(
+        "-l", "--lines", type=int, default=100000, help="lines per single-file input"
+    )
+    parser.add_argument(
+        "-f", "--files", type=int, default=1000, help="files for the command line"
+    )
+    parser.add_argument(
+        "--file-lines", type=int, default=200, help="lines per command line input"
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=1, help="workers for the command line"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="keep the best of this many runs"
+    )
+    parser.add_argument(
+        "-o", dest="output_file", type=Path, help="write the report to this file"
+    )
+    return parser.parse_args()
+
+
+def run() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="toc-benchmark-") as tmp:
+        workdir = Path(tmp)
+        report = {
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "parsers": {
+                family: bench_family(family, args.lines, args.repeat, workdir)
+                for family in args.parsers
+            },
+            "cli": bench_cli(
+                args.parsers,
+                args.files,
+                args.file_lines,
+                args.jobs,
+                args.repeat,
+                workdir,
+            ),
+            "peak_rss_bytes": peak_rss(),
+        }
+    output = json.dumps(report, indent=2)
+    if args.output_file:
+        args.output_file.write_text(output + "\n")
+    else:
+        print(output)
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    run()
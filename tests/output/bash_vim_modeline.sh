@@ -0,0 +1,22 @@
+# vim:set ts=4 sw=4 ft=sh et:
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of bash_vim_modeline.sh                              │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├──┐Nested 1
+# │  └──┐Nested 2
+# │     └──┐Nested 3
+# │        └──┐Nested 4
+# │           └──┐Nested 5
+# │              └── Nested 6
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ Nested 1
+# ################################ Nested 2
+# ################ Nested 3
+# ######## Nested 4
+# #### Nested 5
+# ## Nested 6
+echo "OK"
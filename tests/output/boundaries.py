@@ -0,0 +1,5 @@
+# ## A
+
+# ## Bx = 1  # ## C
+ 
+# ## D
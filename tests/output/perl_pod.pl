@@ -0,0 +1,31 @@
+=encoding utf8
+=begin comment
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of perl_pod.pl                                       │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── NAME
+# ├──┐DESCRIPTION
+# │  ├── Ordinary Paragraph
+# │  └── Verbatim Paragraph
+# │
+# └───────────────────────────────────────────────────────────────
+=end comment
+
+=pod
+
+=head1 NAME
+
+=head1 DESCRIPTION
+
+text
+
+=head2 Ordinary Paragraph
+
+text
+
+=head2 Verbatim Paragraph
+
+text
+
+=cut
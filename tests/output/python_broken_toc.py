@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of python_broken_toc.py                              │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── VARIABLES
+# ├── MODULES
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ VARIABLES
+
+__version__ = "0.1.0"
+
+
+# ################################################################ MODULES
@@ -0,0 +1,26 @@
+"""
+This is a module with a docstring. TOC should be below
+"""
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of python_docstring.py                               │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── Imports
+# ├──┐My class
+# │  └── INIT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ Imports
+
+from pathlib import Path
+
+# ################################################################ My class
+
+
+class Class:
+    # ################################ INIT
+
+    def __init__(self) -> None:
+        self.name = "Class"
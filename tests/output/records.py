@@ -0,0 +1,4 @@
+x = 1
+# ################################################################ Café
+
+# ################################ Über
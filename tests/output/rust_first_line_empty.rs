@@ -0,0 +1,16 @@
+// ┌───────────────────────────────────────────────────────────────┐
+// │ Contents of rust_first_line_empty.rs                          │
+// ├───────────────────────────────────────────────────────────────┘
+// │
+// ├── Rust with empty first line
+// │
+// └───────────────────────────────────────────────────────────────
+
+
+// ################################################################ Rust with empty first line
+
+// A small toc should be placed before first heading
+
+fn main() {
+    println!("Hello, World!");
+}
@@ -0,0 +1,16 @@
+// ┌───────────────────────────────────────────────────────────────┐
+// │ Contents of rust_first_line_space.rs                          │
+// ├───────────────────────────────────────────────────────────────┘
+// │
+// ├── Rust with space in first line
+// │
+// └───────────────────────────────────────────────────────────────
+
+ 
+// ################################################################ Rust with space in first line
+
+// A small toc should be placed before first heading
+
+fn main() {
+    println!("Hello, World!");
+}
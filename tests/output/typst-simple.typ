@@ -0,0 +1,23 @@
+// ┌───────────────────────────────────────────────────────────────┐
+// │ Contents of typst-simple.typ                                  │
+// ├───────────────────────────────────────────────────────────────┘
+// │
+// ├──┐Document Title
+// │  └──┐Heading Level 2
+// │     ├──┐Heading Level 3
+// │     │  └── Heading Level 4
+// │     └── Heading Level 3
+// │
+// └───────────────────────────────────────────────────────────────
+
+// This is a minimal Typst document with multi-level headings and comments
+
+= Document Title
+
+== Heading Level 2
+
+=== Heading Level 3
+
+==== Heading Level 4
+
+=== Heading Level 3
\ No newline at end of file
@@ -0,0 +1,13 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of unchanged.py                                      │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── That's a nice version, __init__?
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ That's a nice version, __init__?
+
+__version__ = "4.20.69"
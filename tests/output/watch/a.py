@@ -0,0 +1,2 @@
+a1
+processed
@@ -0,0 +1 @@
+b
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_batch.py                                     │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# capture stderr to variable
+from io import StringIO
+from contextlib import redirect_stderr
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.batch import Options, process_many, process_one
+
+# ################################################################ TEST CLASSES
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.i = project_root / "tests" / "input"
+        self.o = project_root / "tests" / "output" / "batch"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+
+    def test_modes(self):
+        input_file = self.o / "batch.py"
+        shutil.copy(self.i / "python_shebang.py", input_file)
+        output = StringIO()
+        with redirect_stderr(output):
+            generated = process_one(input_file)
+            outdated = process_one(input_file, Options(mode="check"))
+            added = process_one(input_file, Options(mode="file"))
+            same = process_one(input_file, Options(mode="file"))
+        # nothing is printed by the library
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(generated.status, "generated")
+        self.assertIn("Contents of batch.py", generated.toc)
+        self.assertEqual(outdated.status, "outdated")
+        self.assertEqual(added.status, "added")
+        self.assertIsNone(added.err)
+        self.assertEqual(added.bytesWritten, input_file.stat().st_size)
+        self.assertEqual(same.status, "same")
+        self.assertEqual(same.bytesWritten, 0)
+        # the stat of the write tells it apart from later changes to the file
+        self.assertIsNotNone(added.writtenStat)
+        self.assertEqual(added.writtenStat.st_mtime_ns, input_file.stat().st_mtime_ns)
+        self.assertIsNone(same.writtenStat)
+        self.assertEqual(generated.headings, added.headings)
+        self.assertGreater(added.headings, 0)
+
+    def test_errors(self):
+        results = process_many(
+            [self.o / "missing.py", self.o, self.i / "go_empty.go"],
+            Options(mode="file"),
+        )
+        # the reason why a file could not be read is kept
+        self.assertEqual(
+            [result.status for result in results], ["notfound", "directory", "empty"]
+        )
+
+    def test_many(self):
+        paths = sorted(self.i.glob("*.py"))
+        for jobs in [1, 2]:
+            with self.subTest(jobs=jobs):
+                results = list(process_many(paths, Options(jobs=jobs, profile=True)))
+                # results are yielded in input order
+                self.assertEqual([result.path for result in results], paths)
+                for result in results:
+                    self.assertIsNotNone(result.profile)
+                    self.assertEqual(
+                        result.profile.counters["headings"], result.headings
+                    )
+        with self.assertRaises(ValueError):
+            list(process_many(paths, Options(jobs=-1)))
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
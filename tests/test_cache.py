@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_cache.py                                     │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# change modification time
+import os
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.cache import Cache
+
+# ################################################################ TEST CLASSES
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "cache"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+        self.cacheFile = self.o / "cache.json"
+        self.inputFile = self.o / "file.py"
+        self.inputFile.write_text("# ################################ Title\n")
+
+    def test_fresh_after_store(self):
+        c = Cache(self.cacheFile).load()
+        self.assertFalse(c.fresh(self.inputFile))
+        c.store(self.inputFile)
+        c.save()
+        self.assertTrue(Cache(self.cacheFile).load().fresh(self.inputFile))
+
+    def test_options(self):
+        c = Cache(self.cacheFile, "a")
+        c.store(self.inputFile)
+        c.save()
+        self.assertFalse(Cache(self.cacheFile, "b").load().fresh(self.inputFile))
+
+    def test_touched(self):
+        c = Cache(self.cacheFile)
+        c.store(self.inputFile)
+        # same content, different mtime
+        os.utime(self.inputFile, ns=(0, 0))
+        self.assertTrue(c.fresh(self.inputFile))
+        # different content, same size
+        self.inputFile.write_text("# ################################ Other\n")
+        self.assertFalse(c.fresh(self.inputFile))
+
+    def test_eviction(self):
+        c = Cache(self.cacheFile, maxEntries=2)
+        files = []
+        for i in range(3):
+            files.append(self.o / f"{i}.py")
+            files[i].write_text(str(i))
+            c.store(files[i])
+        # the first file becomes the most recently used
+        self.assertTrue(c.fresh(files[0]))
+        c.save()
+        c = Cache(self.cacheFile, maxEntries=2).load()
+        self.assertEqual(
+            [c.fresh(inputFile) for inputFile in files], [True, False, True]
+        )
+
+    def test_corrupted(self):
+        self.cacheFile.write_text("{")
+        self.assertEqual(len(Cache(self.cacheFile).load().entries), 0)
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -29,6 +29,20 @@ from unittest.mock import patch
 # current directory
 from pathlib import Path
 
+# isolate cache
+import os
+import shutil
+
+# measure import time in a fresh interpreter, create a git repository
+import subprocess
+
+# find headings in output
+import re
+import tempfile
+
+# profiling report
+import json
+
 # load local module rather than system installed version
 import sys
 
@@ -36,7 +50,7 @@ project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 # module to test
-from toc.cli import main
+from toc.cli import main, parse_args, process_file
 
 # from toc.__version__ import __version__
 
@@ -76,14 +90,14 @@ class TestCli(unittest.TestCase):
                 self.assertEqual("No files provided\n", output.getvalue())
 
     # returns SystemExit: 0 from argparse module with "-v"
-    # def test_version(self):
-    #    test_args = ["toc/cli.py", "-v"]
-    #    with patch.object(sys, "argv", test_args):
-    #        output = StringIO()
-    #        with redirect_stdout(output):
-    #            main()
-    #            print("output: '" + output.getvalue().strip() + "'")
-    #            self.assertTrue(f'toc {__version__}' in output.getvalue())
+    def test_version(self):
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "-v"]
+        with patch.object(sys, "argv", test_args):
+            output = StringIO()
+            with redirect_stdout(output), self.assertRaises(SystemExit) as exit:
+                main()
+            self.assertEqual(exit.exception.code, 0)
+            self.assertRegex(output.getvalue(), r"^toc \d+\.\d+")
 
     # fails if not project root
     def test_empty(self):
@@ -107,6 +121,300 @@ class TestCli(unittest.TestCase):
                     and "Contents of USAGE.md" in output.getvalue()
                 )
 
+    def test_jobs(self):
+        outputs = []
+        for jobs in ["1", "2"]:
+            test_args = [
+                f"{self.p / 'toc' / 'cli.py'}",
+                "-j",
+                jobs,
+                "-l",
+                f"{self.p / '.tocfiles'}",
+            ]
+            with patch.object(sys, "argv", test_args):
+                output = StringIO()
+                with redirect_stdout(output):
+                    main()
+                outputs.append(output.getvalue())
+        # parallel output is printed in the same order as the serial one
+        self.assertEqual(outputs[0], outputs[1])
+        # negative values are rejected rather than meaning one worker per cpu
+        with patch.object(sys, "argv", test_args[:1] + ["-j", "-1", "README.md"]):
+            output = StringIO()
+            with redirect_stderr(output), self.assertRaises(SystemExit) as exit:
+                main()
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn("--jobs must be 0 or more", output.getvalue())
+
+    def test_cache(self):
+        cache_home = self.o / "cache_home"
+        shutil.rmtree(cache_home, ignore_errors=True)
+        input_file = self.o / "cached.py"
+        shutil.copy(self.i / "python_shebang.py", input_file)
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "-f", f"{input_file}"]
+        with (
+            patch.dict(os.environ, {"XDG_CACHE_HOME": str(cache_home)}),
+            patch.object(sys, "argv", test_args),
+            patch("toc.cli.process_file", wraps=process_file) as processed,
+        ):
+            for _ in range(3):
+                with redirect_stderr(StringIO()):
+                    main()
+            # the toc is up-to-date after the first run, later runs skip the file
+            self.assertEqual(processed.call_count, 1)
+            with patch.object(sys, "argv", test_args + ["--no-cache"]):
+                with redirect_stderr(StringIO()):
+                    main()
+            self.assertEqual(processed.call_count, 2)
+
+    def test_cache_languages(self):
+        # editing the user languages invalidates the cached files
+        cache_home = self.o / "cache_home"
+        config_home = self.o / "config_home"
+        shutil.rmtree(cache_home, ignore_errors=True)
+        shutil.rmtree(config_home, ignore_errors=True)
+        Path.mkdir(config_home / "toc", parents=True)
+        config = config_home / "toc" / "languages.json"
+        input_file = self.o / "cached_languages.py"
+        shutil.copy(self.i / "python_shebang.py", input_file)
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "-f", f"{input_file}"]
+        with (
+            patch.dict(
+                os.environ,
+                {
+                    "XDG_CACHE_HOME": str(cache_home),
+                    "XDG_CONFIG_HOME": str(config_home),
+                },
+            ),
+            patch.object(sys, "argv", test_args),
+            patch("toc.cli.process_file", wraps=process_file) as processed,
+        ):
+            config.write_text("{}")
+            for _ in range(2):
+                with redirect_stderr(StringIO()):
+                    main()
+            self.assertEqual(processed.call_count, 1)
+            config.write_text('{"foo": {"character": "//"}}')
+            with redirect_stderr(StringIO()):
+                main()
+            self.assertEqual(processed.call_count, 2)
+
+    def test_import_time(self):
+        # the cli is launched on every save by editor plugins, keep its startup fast
+        budget = 0.1
+        with tempfile.TemporaryDirectory() as pycache:
+            env = dict(os.environ, PYTHONPYCACHEPREFIX=pycache)
+            env.pop("PYTHONDONTWRITEBYTECODE", None)
+            timings = []
+            # the first run only compiles bytecode
+            for _ in range(4):
+                result = subprocess.run(
+                    [
+                        sys.executable,
+                        "-X",
+                        "importtime",
+                        "-c",
+                        "import sys, toc.cli; print(*sys.modules)",
+                    ],
+                    cwd=self.p,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                )
+                for line in result.stderr.splitlines():
+                    # import time: self [us] | cumulative | imported package
+                    if line.endswith("| toc.cli"):
+                        timings.append(int(line.split("|")[1]) / 1e6)
+        modules = result.stdout.split()
+        for module in ["importlib_metadata", "importlib.metadata", "multiprocessing"]:
+            self.assertNotIn(module, modules)
+        self.assertLess(min(timings[1:]), budget)
+
+    @unittest.skipUnless(shutil.which("git"), "git is not installed")
+    def test_changed(self):
+        repo = self.o / "git"
+        shutil.rmtree(repo, ignore_errors=True)
+        Path.mkdir(repo / "sub", parents=True)
+        git = ["git", "-c", "user.name=toc", "-c", "user.email=toc@localhost"]
+        subprocess.run(git + ["init", "-q"], cwd=repo, check=True)
+        for name in ["committed.py", "modified.py", "staged.py", "sub/other.py"]:
+            (repo / name).write_text(f"# ################ {name}\n")
+        subprocess.run(git + ["add", "."], cwd=repo, check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "init"], cwd=repo, check=True)
+        (repo / "modified.py").write_text("# ################ Modified\n")
+        (repo / "staged.py").write_text("# ################ Staged\n")
+        (repo / "untracked.py").write_text("# ################ Untracked\n")
+        subprocess.run(git + ["add", "staged.py"], cwd=repo, check=True)
+        (repo / "list.txt").write_text("*.py\nsub/*.py\n")
+        cwd = Path.cwd()
+        try:
+            os.chdir(repo)
+            for flags, expected in [
+                (["--changed-since", "HEAD"], ["Modified", "Staged", "Untracked"]),
+                (["--staged"], ["Staged"]),
+            ]:
+                with self.subTest(flags=flags):
+                    test_args = [f"{self.p / 'toc' / 'cli.py'}", "-l", "list.txt"]
+                    with patch.object(sys, "argv", test_args + flags):
+                        output = StringIO()
+                        with redirect_stdout(output):
+                            main()
+                    headings = re.findall(r"── (\w+)", output.getvalue())
+                    self.assertEqual(sorted(headings), expected)
+        finally:
+            os.chdir(cwd)
+
+    def test_check(self):
+        input_file = self.o / "check.py"
+        shutil.copy(self.i / "python_shebang.py", input_file)
+        content = input_file.read_text()
+        for jobs in ["1", "2"]:
+            with self.subTest(jobs=jobs):
+                test_args = [
+                    f"{self.p / 'toc' / 'cli.py'}",
+                    "--check",
+                    "--no-cache",
+                    "-j",
+                    jobs,
+                    f"{input_file}",
+                    f"{self.p / 'README.md'}",
+                ]
+                with patch.object(sys, "argv", test_args):
+                    output = StringIO()
+                    with redirect_stderr(output), self.assertRaises(SystemExit) as exit:
+                        main()
+                self.assertEqual(exit.exception.code, 1)
+                self.assertIn(f'Outdated toc in "{input_file}"', output.getvalue())
+                self.assertNotIn("README.md", output.getvalue())
+                # files are never written
+                self.assertEqual(input_file.read_text(), content)
+        with patch.object(
+            sys, "argv", test_args[:1] + ["--no-cache", "-f", f"{input_file}"]
+        ):
+            with redirect_stderr(StringIO()):
+                main()
+        with patch.object(sys, "argv", test_args):
+            with redirect_stderr(StringIO()):
+                main()
+
+    def test_profile(self):
+        files = [f"{self.i / 'python_shebang.py'}", f"{self.i / 'r_simple.R'}"]
+        for jobs in ["1", "2"]:
+            with self.subTest(jobs=jobs):
+                test_args = [f"{self.p / 'toc' / 'cli.py'}", "-j", jobs, *files]
+                with (
+                    patch.object(sys, "argv", test_args),
+                    patch.dict(os.environ, {"TOC_PROFILE": "json"}),
+                ):
+                    output = StringIO()
+                    with redirect_stdout(StringIO()), redirect_stderr(output):
+                        main()
+                report = json.loads(output.getvalue())
+                # workers send their timings back to the main process
+                self.assertEqual(
+                    sorted(profile["file"] for profile in report["files"]), files
+                )
+                self.assertGreater(report["total"]["headings"], 0)
+        cprofile = self.o / "cli.prof"
+        cprofile.unlink(missing_ok=True)
+        # the flag never takes the following file as a value
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "--cprofile", f"{cprofile}"]
+        with patch.object(sys, "argv", [*test_args, "--profile", *files]):
+            output = StringIO()
+            with redirect_stdout(StringIO()), redirect_stderr(output):
+                main()
+        self.assertIn("parse ms", output.getvalue())
+        self.assertTrue(cprofile.exists())
+
+    def test_profile_environment(self):
+        # only explicit values enable profiling
+        for value, expected in [
+            ("1", (True, "table")),
+            ("Yes", (True, "table")),
+            ("true", (True, "table")),
+            ("json", (True, "json")),
+            ("0", (False, "table")),
+            ("false", (False, "table")),
+            ("", (False, "table")),
+        ]:
+            with self.subTest(value=value):
+                with (
+                    patch.object(sys, "argv", ["toc", "a.py"]),
+                    patch.dict(os.environ, {"TOC_PROFILE": value}),
+                ):
+                    args = parse_args()
+                    self.assertEqual((args.profile, args.profile_format), expected)
+
+    def test_quiet(self):
+        input_file = self.o / "quiet.py"
+        shutil.copy(self.i / "python_shebang.py", input_file)
+        missing = self.o / "missing.py"
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "-q", "--no-cache", "-f"]
+        with patch.object(sys, "argv", [*test_args, f"{input_file}", f"{missing}"]):
+            output = StringIO()
+            with redirect_stderr(output):
+                main()
+        # a single summary line instead of a message per file
+        self.assertEqual(output.getvalue(), "2 files: 1 added, 1 notfound\n")
+        self.assertIn("Contents of quiet.py", input_file.read_text())
+
+    def test_format(self):
+        input_files = [f"{self.i / 'python_black.py'}", f"{self.i / 'r_simple.R'}"]
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "--no-cache", "-j", "2"]
+        outputs = {}
+        for format in ["json", "ndjson"]:
+            with patch.object(
+                sys, "argv", [*test_args, "--format", format, *input_files]
+            ):
+                output = StringIO()
+                with redirect_stdout(output):
+                    main()
+            outputs[format] = output.getvalue()
+        records = json.loads(outputs["json"])
+        # formatted like the records of an index query
+        self.assertEqual(outputs["json"], json.dumps(records, indent=4) + "\n")
+        # one object per line, in input order
+        self.assertEqual(
+            records, [json.loads(line) for line in outputs["ndjson"].splitlines()]
+        )
+        self.assertEqual([r["file"] for r in records][-1], input_files[1])
+        self.assertEqual(records[0]["file"], input_files[0])
+        self.assertEqual(set(records[0]), {"file", "level", "text", "line", "offset"})
+
+    def test_index(self):
+        index_file = self.o / "index.db"
+        index_file.unlink(missing_ok=True)
+        input_files = [f"{self.i / 'python_black.py'}", f"{self.i / 'r_simple.R'}"]
+        test_args = [f"{self.p / 'toc' / 'cli.py'}", "--index", f"{index_file}"]
+        summaries = []
+        for _ in range(2):
+            with patch.object(sys, "argv", [*test_args, *input_files]):
+                output = StringIO()
+                with redirect_stderr(output):
+                    main()
+            summaries.append(output.getvalue())
+        # files are only parsed again if they changed
+        self.assertEqual(summaries, ["2 files: 2 parsed\n", "2 files: 2 unchanged\n"])
+        with patch.object(sys, "argv", [*test_args, "--query", "head 2"]):
+            output = StringIO()
+            with redirect_stdout(output):
+                main()
+        # a single heading, as file:line: text
+        self.assertEqual(len(output.getvalue().splitlines()), 1)
+        self.assertTrue(output.getvalue().endswith("r_simple.R:5: Head 2\n"))
+        # the same json as when processing files
+        for query, expected in [("head 2", 1), ("nothing", 0)]:
+            with patch.object(
+                sys, "argv", [*test_args, "--query", query, "--format", "json"]
+            ):
+                output = StringIO()
+                with redirect_stdout(output):
+                    main()
+            records = json.loads(output.getvalue())
+            self.assertEqual(len(records), expected)
+            self.assertEqual(output.getvalue(), json.dumps(records, indent=4) + "\n")
+
     def test_stdin(self):
         test_args = [f"{self.p / 'toc' / 'cli.py'}", "-e", "html", "-"]
         stdin_content = """
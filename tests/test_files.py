@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_files.py                                     │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# count directory walks
+import os
+from unittest.mock import patch
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.files import expand
+
+# ################################################################ TEST CLASSES
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "files"
+        shutil.rmtree(self.o, ignore_errors=True)
+        for name in [
+            "README.md",
+            "a.py",
+            "src/b.py",
+            "src/c.min.js",
+            "src/deep/d.py",
+            "build/e.py",
+            "other/f.txt",
+        ]:
+            Path.mkdir((self.o / name).parent, parents=True, exist_ok=True)
+            (self.o / name).write_text("")
+
+    def relative(self, lines: list[str]) -> list[str]:
+        return [path.relative_to(self.o).as_posix() for path in expand(lines, self.o)]
+
+    def test_same_as_pathlib(self):
+        for line in ["*.py", "**/*.py", "src/*", "[ab].py", "src/?.py", "**/deep/*"]:
+            with self.subTest(line=line):
+                expected = sorted(
+                    path.relative_to(self.o).as_posix()
+                    for path in self.o.glob(line)
+                    if path.is_file()
+                )
+                self.assertEqual(sorted(self.relative([line])), expected)
+
+    def test_trailing_recursive(self):
+        # unlike pathlib before python 3.13, a trailing "**" matches files too
+        self.assertEqual(
+            self.relative(["src/**"]), ["src/b.py", "src/c.min.js", "src/deep/d.py"]
+        )
+
+    def test_order_and_duplicates(self):
+        # files are sorted by the first pattern matching them, and never repeated
+        self.assertEqual(
+            self.relative(["README.md", "src/**/*.py", "**/*.py"]),
+            ["README.md", "src/b.py", "src/deep/d.py", "a.py", "build/e.py"],
+        )
+
+    def test_exclude(self):
+        self.assertEqual(
+            self.relative(["**/*", "!build/", "!*.js", "!src/deep/*", "!*.txt"]),
+            ["README.md", "a.py", "src/b.py"],
+        )
+        # a later pattern includes a file again
+        self.assertEqual(
+            self.relative(["**/*.py", "!src/**", "src/b.py"]),
+            ["a.py", "build/e.py", "src/b.py"],
+        )
+
+    def test_single_walk(self):
+        # every directory is listed at most once, and those that cannot match are never listed
+        with patch("toc.files.os.scandir", wraps=os.scandir) as scandir:
+            self.relative(["*.md", "src/*.py", "src/**/*.py", "!build/"])
+        listed = sorted(
+            Path(call.args[0]).relative_to(self.o).as_posix()
+            for call in scandir.call_args_list
+        )
+        self.assertEqual(listed, [".", "src", "src/deep"])
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_index.py                                     │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# change modification time
+import os
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.batch import Options, process_one
+from toc.index import Index
+
+# ################################################################ TEST CLASSES
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "index"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+        self.indexFile = self.o / "index.db"
+        self.inputFile = self.o / "file.py"
+        self.inputFile.write_text(
+            "# ################################ Title\n# ################ 100%_done\n"
+        )
+
+    def update(self, index: Index, files: list[Path]) -> list[Path]:
+        stale = index.stale(files)
+        for path in stale:
+            index.store(process_one(path, Options(mode="headings")))
+        return stale
+
+    def test_stale_after_store(self):
+        index = Index(self.indexFile).open()
+        self.assertEqual(self.update(index, [self.inputFile]), [self.inputFile])
+        index.close()
+        index = Index(self.indexFile).open()
+        self.assertEqual(index.stale([self.inputFile]), [])
+        # other parsing options give other headings
+        self.assertEqual(
+            Index(self.indexFile, "b").open().stale([self.inputFile]), [self.inputFile]
+        )
+        index.close()
+
+    def test_touched(self):
+        index = Index(self.indexFile).open()
+        self.update(index, [self.inputFile])
+        # same content, different mtime
+        os.utime(self.inputFile, ns=(0, 0))
+        self.assertEqual(index.stale([self.inputFile]), [])
+        # different content, same size
+        self.inputFile.write_text(self.inputFile.read_text().replace("Title", "Other"))
+        self.assertEqual(self.update(index, [self.inputFile]), [self.inputFile])
+        self.assertEqual([r["text"] for r in index.search("title")], [])
+        self.assertEqual([r["text"] for r in index.search("other")], ["Other"])
+        index.close()
+
+    def test_search(self):
+        index = Index(self.indexFile).open()
+        self.update(index, [self.inputFile])
+        records = index.search("TITLE")
+        self.assertEqual(len(records), 1)
+        self.assertEqual(
+            records[0],
+            {
+                "file": str(self.inputFile),
+                "level": 2,
+                "text": "Title",
+                "line": 1,
+                "offset": 0,
+            },
+        )
+        # wildcards of sql are matched literally
+        self.assertEqual([r["line"] for r in index.search("0%_")], [2])
+        self.assertEqual(index.search("_t"), [])
+        index.close()
+
+    def test_fulltext(self):
+        index = Index(self.indexFile).open()
+        self.update(index, [self.inputFile])
+        # the trigram index is looked up for texts of three characters or more
+        queries: list[str] = []
+        index.connection.set_trace_callback(queries.append)
+        self.assertEqual([r["text"] for r in index.search("ITL")], ["Title"])
+        self.assertTrue(index.fulltext)
+        # statements run by fts5 itself are traced too
+        self.assertTrue(any("headings_text_idx" in query for query in queries))
+        queries.clear()
+        self.assertEqual([r["text"] for r in index.search("TI")], ["Title"])
+        self.assertFalse(any("headings_text" in query for query in queries))
+        self.assertEqual([r["text"] for r in index.search('0%"')], [])
+        index.close()
+
+    def test_prune(self):
+        index = Index(self.indexFile).open()
+        other = self.o / "other" / "file.py"
+        Path.mkdir(other.parent)
+        shutil.copy(self.inputFile, other)
+        self.update(index, [self.inputFile, other])
+        self.assertEqual(index.prune([str(self.o)]), 0)
+        self.inputFile.unlink()
+        other.unlink()
+        # files outside of the pruned directories are never checked
+        self.assertEqual(index.prune([str(other.parent)]), 1)
+        self.assertEqual(len(index.search("title")), 1)
+        self.assertEqual(index.prune([str(self.o), str(other.parent)]), 1)
+        self.assertEqual(index.search("title"), [])
+        index.close()
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_languages.py                                 │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# capture stderr to variable
+from io import StringIO
+from contextlib import redirect_stderr
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.languages import BUILTIN, DEFAULT, Language, language, load_config
+
+# ################################################################ TEST CLASSES
+
+
+class TestLanguages(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "languages"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+        self.configFile = self.o / "languages.json"
+
+    def test_builtin(self):
+        self.assertEqual(language("c").character, "//")
+        self.assertEqual(language("md").parser, "increasing")
+        self.assertEqual(language("css").prefix, ("/*",))
+        self.assertEqual(language("tex").directives, "magic")
+        # only markdown places the toc after a frontmatter
+        self.assertEqual(language("md").directives, "frontmatter")
+        for extension in ["mdx", "qmd", "rmd"]:
+            self.assertEqual(language(extension).directives, "generic")
+        self.assertIs(language("xyz"), DEFAULT)
+
+    def test_config(self):
+        self.configFile.write_text(
+            '{"xyz": {"character": "//", "prefix": "/*", "suffix": ["*/"]},'
+            ' ".MD": {"character": "#"}}'
+        )
+        languages = load_config(self.configFile)
+        self.assertEqual(
+            languages["xyz"], Language("//", prefix=("/*",), suffix=("*/",))
+        )
+        # fields not set are inherited from the built-in language
+        self.assertEqual(languages["md"], BUILTIN["md"]._replace(character="#"))
+
+    def test_config_missing(self):
+        self.assertEqual(load_config(self.configFile), {})
+
+    def test_config_invalid(self):
+        for content in ["{", '{"xyz": {"color": "red"}}', '{"xyz": {"parser": "x"}}']:
+            with self.subTest(content=content):
+                self.configFile.write_text(content)
+                output = StringIO()
+                with redirect_stderr(output):
+                    self.assertEqual(load_config(self.configFile), {})
+                self.assertIn("Could not read languages", output.getvalue())
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_profiling.py                                 │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# machine-readable report
+import json
+
+# clean output path if existing
+import shutil
+
+# capture stderr to variable
+from io import StringIO
+from contextlib import redirect_stderr
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.profiling import Profile, report
+from toc.toc import Toc
+
+# ################################################################ TEST CLASSES
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "profiling"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+
+    def test_phases(self):
+        input_file = self.o / "profile.py"
+        shutil.copy(project_root / "tests" / "input" / "python_shebang.py", input_file)
+        size = input_file.stat().st_size
+        t = Toc(input_file)
+        t.set_character()
+        t.profile = Profile(str(input_file))
+        with redirect_stderr(StringIO()):
+            t.to_file()
+        for phase in ["read", "parse", "prettify", "compare", "write"]:
+            self.assertGreater(t.profile.timings[phase], 0, phase)
+        self.assertEqual(t.profile.counters["bytes"], size)
+        self.assertEqual(t.profile.counters["headings"], len(t._toc_headings()))
+        # one match per line, plus the search for an existing toc and the directives
+        self.assertGreater(t.profile.counters["regex"], t.profile.counters["headings"])
+
+    def test_disabled(self):
+        # without a profile, parsers use the shared patterns directly
+        t = Toc(Path("mock.py"))
+        self.assertIs(
+            t._regex("generic", "#"), Toc(Path("other.py"))._regex("generic", "#")
+        )
+
+    def test_report(self):
+        profiles = []
+        for i in range(5):
+            profile = Profile(f"file{i}.py")
+            profile.timings["parse"] = i / 1000
+            profile.counters["headings"] = i
+            profiles.append(profile)
+        table = report(profiles, rows=2).splitlines()
+        # header, the two slowest files, the number of hidden files and the totals
+        self.assertEqual(len(table), 5)
+        self.assertTrue(table[1].startswith("file4.py"))
+        self.assertTrue(table[2].startswith("file3.py"))
+        self.assertIn("3 faster files", table[3])
+        self.assertTrue(table[4].startswith("total"))
+        self.assertEqual(table[4].split()[-3:], ["0", "10", "0"])
+        data = json.loads(report(profiles, "json"))
+        self.assertEqual([p["file"] for p in data["files"]][0], "file4.py")
+        self.assertEqual(data["total"]["headings"], 10)
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_server.py                                    │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# requests and responses
+import json
+
+# in-memory streams
+from io import StringIO
+from contextlib import redirect_stderr
+
+# clean output path if existing
+import shutil
+
+# simulate internal failures
+from unittest.mock import patch
+
+# socket transport
+import socket
+import threading
+
+# server process stopped by a signal
+import os
+import signal
+import subprocess
+import time
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.server import Handler, main, serve
+from toc.toc import Toc
+
+# ################################################################ TEST CLASSES
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "server"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+        self.text = "#!/bin/sh\n\n# ################################ Title\necho 1\n"
+
+    def requests(self, *requests) -> list:
+        # send one request per line, returning the responses
+        output = StringIO()
+        serve(StringIO("\n".join(json.dumps(r) for r in requests) + "\n"), output)
+        return [json.loads(line) for line in output.getvalue().splitlines()]
+
+    def test_toc(self):
+        params = {"text": self.text, "extension": "sh"}
+        responses = self.requests(
+            {"jsonrpc": "2.0", "id": 1, "method": "toc", "params": params}
+        )
+        self.assertEqual(responses[0]["id"], 1)
+        self.assertIn("Contents of stdin.sh", responses[0]["result"]["toc"])
+        self.assertIn("└── Title", responses[0]["result"]["toc"])
+
+    def test_apply(self):
+        # the buffer gets the same toc that would be written to the file
+        inputFile = self.o / "apply.sh"
+        inputFile.write_text(self.text)
+        t = Toc(inputFile)
+        t.set_character()
+        t.to_file()
+        params = {"text": self.text, "path": str(inputFile)}
+        first, second = self.requests(
+            {"id": 1, "method": "apply", "params": params},
+            {
+                "id": 2,
+                "method": "apply",
+                "params": {**params, "text": inputFile.read_text()},
+            },
+        )
+        self.assertEqual(first["result"]["content"], inputFile.read_text())
+        self.assertTrue(first["result"]["changed"])
+        self.assertFalse(second["result"]["changed"])
+
+    def test_write(self):
+        inputFile = self.o / "write.sh"
+        inputFile.write_text(self.text)
+        (response,) = self.requests(
+            {"id": 1, "method": "write", "params": {"path": str(inputFile)}}
+        )
+        self.assertIsNone(response["result"]["err"])
+        self.assertIn("Contents of write.sh", inputFile.read_text())
+
+    def test_errors(self):
+        responses = self.requests(
+            {"id": 1, "method": "unknown"},
+            {"id": 2, "method": "toc", "params": {}},
+            {"method": "toc", "params": {"text": ""}},
+            {"id": 3, "method": "shutdown"},
+            {"id": 4, "method": "toc", "params": {"text": ""}},
+        )
+        # notifications get no response, and requests after shutdown are ignored
+        self.assertEqual([r["id"] for r in responses], [1, 2, 3])
+        self.assertEqual(responses[0]["error"]["code"], -32601)
+        self.assertEqual(responses[1]["error"]["code"], -32602)
+        output = StringIO()
+        serve(StringIO("{\n"), output)
+        self.assertEqual(json.loads(output.getvalue())["error"]["code"], -32700)
+
+    def test_invalid_params(self):
+        responses = self.requests(
+            {"id": 1, "method": "toc", "params": {"text": 5, "extension": "py"}},
+            {"id": 2, "method": "toc", "params": {"text": "", "extension": 5}},
+            {"id": 3, "method": "toc", "params": {"text": "", "depth": "1"}},
+            {
+                "id": 4,
+                "method": "toc",
+                "params": {"text": self.text, "extension": "sh"},
+            },
+        )
+        self.assertEqual([r["error"]["code"] for r in responses[:3]], [-32602] * 3)
+        # the server is still running
+        self.assertIn("Title", responses[3]["result"]["toc"])
+
+    def test_internal_error(self):
+        # unexpected failures are reported, without stopping the server
+        with patch.object(Toc, "generate", side_effect=KeyError("boom")):
+            responses = self.requests(
+                {"id": 1, "method": "toc", "params": {"text": self.text}},
+                {"id": 2, "method": "apply", "params": {"text": self.text}},
+            )
+        self.assertEqual(responses[0]["error"]["code"], -32603)
+        self.assertIn("result", responses[1])
+
+    def test_socket(self):
+        server, client = socket.socketpair()
+        thread = threading.Thread(target=Handler, args=(server, "", None))
+        thread.start()
+        with client, client.makefile("rw", encoding="utf-8") as f:
+            request = {
+                "id": 1,
+                "method": "toc",
+                "params": {"text": self.text, "extension": "sh"},
+            }
+            f.write(json.dumps(request) + "\n")
+            f.flush()
+            self.assertIn("Title", json.loads(f.readline())["result"]["toc"])
+            f.write(json.dumps({"id": 2, "method": "shutdown"}) + "\n")
+            f.flush()
+            thread.join()
+        server.close()
+
+    def test_socket_file(self):
+        # the socket is private, and removed when the server is terminated
+        socketFile = self.o / "toc.sock"
+        process = subprocess.Popen(
+            [sys.executable, "-m", "toc.cli", "--serve", str(socketFile)],
+            cwd=project_root,
+        )
+        request = {
+            "id": 1,
+            "method": "toc",
+            "params": {"text": self.text, "extension": "sh"},
+        }
+        try:
+            with socket.socket(socket.AF_UNIX) as client:
+                # the socket file exists slightly before the server listens
+                deadline = time.monotonic() + 5
+                while True:
+                    try:
+                        client.connect(str(socketFile))
+                        break
+                    except (FileNotFoundError, ConnectionRefusedError):
+                        if time.monotonic() > deadline:
+                            raise
+                        time.sleep(0.01)
+                self.assertEqual(os.stat(socketFile).st_mode & 0o777, 0o600)
+                with client.makefile("rw", encoding="utf-8") as f:
+                    f.write(json.dumps(request) + "\n")
+                    f.flush()
+                    self.assertIn("Title", json.loads(f.readline())["result"]["toc"])
+        finally:
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(timeout=5), 0)
+        self.assertFalse(socketFile.exists())
+
+    def test_socket_file_exists(self):
+        # any other file is left alone
+        socketFile = self.o / "precious.md"
+        socketFile.write_text("precious\n")
+        with redirect_stderr(StringIO()), self.assertRaises(SystemExit):
+            main(socketFile)
+        self.assertEqual(socketFile.read_text(), "precious\n")
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
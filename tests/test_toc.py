@@ -26,6 +26,15 @@ from pathlib import Path
 # fake files
 from unittest.mock import patch
 
+# fake stdin
+from io import StringIO
+
+# share a toc between threads
+from concurrent.futures import ThreadPoolExecutor
+
+# linear parsing
+import time
+
 # load local module rather than system installed version
 import sys
 
@@ -33,7 +42,8 @@ project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
 # module to test
-from toc.toc import Toc
+from toc.toc import Heading, Toc
+from toc.profiling import Profile
 
 # ################################################################ TEST CLASSES
 # ################################ SINGLE METHODS
@@ -113,7 +123,7 @@ class TestTocMethods(unittest.TestCase):
         lines = [
             "# ################################################################ Heading 1"
         ]
-        expected = ["# ├── Heading 1"]
+        expected = [Heading(1, "Heading 1", 1)]
         result = t._process_generic(lines)
         self.assertEqual(result, expected)
 
@@ -122,35 +132,88 @@ class TestTocMethods(unittest.TestCase):
         t = Toc(input_file)
         t.set_character()
         lines = ["*** Transactions"]
-        expected = ["; │     └── Transactions"]
+        expected = [Heading(3, "Transactions", 1)]
         result = t._process_increasing(lines, "*")
         self.assertEqual(result, expected)
 
+    def test_process_html(self):
+        input_file = Path("mock.html")
+        t = Toc(input_file)
+        # an unclosed heading used to backtrack for minutes over the rest of the page
+        data = (
+            "<H1 class=title>Tom &amp; <b>Jerry</b></H1>\n"
+            + "<h2>Unclosed\n"
+            + "<p>\n" * 10000
+            + "<h3>\n  Multi\n  line\n</h3>"
+        )
+        expected = [
+            Heading(1, "Tom &amp; Jerry", 1),
+            Heading(2, "Unclosed", 2),
+            Heading(3, "Multi line", 10003),
+        ]
+        result = t._process_html(data)
+        self.assertEqual(result, expected)
+
+    def test_process_html_unclosed(self):
+        t = Toc(Path("mock.html"))
+        for data, expected in [
+            # headings still open at the end of the page
+            (
+                "<h1>T</h1>\n<h2>Open at EOF\n",
+                [Heading(1, "T", 1), Heading(2, "Open at EOF", 2)],
+            ),
+            ("<h2>Only\n", [Heading(2, "Only", 1)]),
+            # comments, scripts and styles are skipped, even when unclosed
+            ("<!-- <h1>A</h1> -->\n<h2>B<!-- x --></h2>", [Heading(2, "B", 2)]),
+            (
+                "<script>'<h1>A</h1>'</script><h2>B</h2><!-- <h3>C</h3>",
+                [Heading(2, "B", 1)],
+            ),
+            ("<h1>A</h1><STYLE>h1 { color: red }", [Heading(1, "A", 1)]),
+            # a tag that never ends does not hide the following headings
+            ("<h1 class='x\n<h2>B</h2>", [Heading(1, "", 1), Heading(2, "B", 2)]),
+        ]:
+            with self.subTest(data=data):
+                self.assertEqual(t._process_html(data), expected)
+
+    def test_process_html_linear(self):
+        # unclosed comments or tags used to be scanned again and again, growing quadratically
+        t = Toc(Path("mock.html"))
+        page = (
+            "<h2>Title</h2>\n"
+            + "<p>Some <b>bold</b> text &amp; a <a href='#'>link</a>.</p>\n" * 50000
+        )
+        for prefix in ["", "<!--", "<div class='x", "<h1>"]:
+            with self.subTest(prefix=prefix):
+                start = time.perf_counter()
+                t._process_html(prefix + page * 2)
+                self.assertLess(time.perf_counter() - start, 2)
+
     def test_prettify_connectors(self):
         input_file = Path("mock.txt")
         t = Toc(input_file)
         input_list = [
-            "# ├── MODULES",
-            "# ├── CLASS",
-            "# │  └── PUBLIC METHODS",
-            "# │     └── COMMENT CHARACTER",
-            "# │     └── TOC OUTPUT",
-            "# │        └── STDOUT",
-            "# │        └── FILE",
-            "# │  └── INTERNAL METHODS",
-            "# │     └── TOC OUTPUT",
-            "# │        └── FILE",
-            "# │           └── ADD",
-            "# │           └── UPDATE",
-            "# │     └── TOC GENERATION",
-            "# │        └── HEADER",
-            "# │        └── BODY",
-            "# │           └── BEANCOUNT AND MARKDOWN",
-            "# │           └── PERL",
-            "# │           └── GENERIC",
-            "# │           └── PRETTIFY CONNECTORS",
-            "# │        └── FOOTER",
-            "# │     └── TOC INPUT",
+            Heading(1, "MODULES", 1),
+            Heading(1, "CLASS", 2),
+            Heading(2, "PUBLIC METHODS", 3),
+            Heading(3, "COMMENT CHARACTER", 4),
+            Heading(3, "TOC OUTPUT", 5),
+            Heading(4, "STDOUT", 6),
+            Heading(4, "FILE", 7),
+            Heading(2, "INTERNAL METHODS", 8),
+            Heading(3, "TOC OUTPUT", 9),
+            Heading(4, "FILE", 10),
+            Heading(5, "ADD", 11),
+            Heading(5, "UPDATE", 12),
+            Heading(3, "TOC GENERATION", 13),
+            Heading(4, "HEADER", 14),
+            Heading(4, "BODY", 15),
+            Heading(5, "BEANCOUNT AND MARKDOWN", 16),
+            Heading(5, "PERL", 17),
+            Heading(5, "GENERIC", 18),
+            Heading(5, "PRETTIFY CONNECTORS", 19),
+            Heading(4, "FOOTER", 20),
+            Heading(3, "TOC INPUT", 21),
         ]
         expected_list = [
             "# ├── MODULES",
@@ -189,6 +252,300 @@ class TestTocMethods(unittest.TestCase):
             self.assertEqual(data, "")
             self.assertEqual(t.err, "binary")
 
+    def test_read_stdin_twice(self):
+        with patch("sys.stdin", StringIO("# ################################ Title")):
+            t = Toc(Path("-"))
+            first, second = t._read_file(), t._read_file()
+            self.assertEqual(first, second)
+            self.assertEqual(t._toc_body(), ["# │  └── Title"])
+
+    def test_read_file_once(self):
+        input_file = project_root / "tests" / "input" / "python_black.py"
+        output_file = project_root / "tests" / "output" / "read_once.py"
+        Path.mkdir(output_file.parent, parents=True, exist_ok=True)
+        with patch.object(
+            Toc, "_load_file", autospec=True, side_effect=Toc._load_file
+        ) as load:
+            t = Toc(input_file)
+            t.set_character()
+            t.lineNumbers = True
+            t.to_file(output_file)
+            self.assertEqual(load.call_count, 1)
+
+    def test_stream_headings(self):
+        input_file = project_root / "tests" / "input" / "markdown_yaml_frontmatter.md"
+        outputs = []
+        for stream_size in [2**40, 0]:
+            t = Toc(input_file)
+            t.set_character()
+            t.lineNumbers = True
+            t.streamSize = stream_size
+            output = StringIO()
+            with patch("sys.stdout", output):
+                t.to_stdout()
+            outputs.append(output.getvalue())
+        # the streamed file is never loaded as a whole
+        self.assertIsNone(t._data)
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_scan_generic(self):
+        # memory-mapped files get the same toc as files read line by line
+        crlf = project_root / "tests" / "output" / "crlf.py"
+        crlf.write_bytes(
+            (project_root / "tests" / "input" / "python_black.py")
+            .read_bytes()
+            .replace(b"\n", b"\r\n")
+        )
+        # only "\n", "\r\n" and "\r" end lines, unlike str.splitlines()
+        boundaries = project_root / "tests" / "output" / "boundaries.py"
+        boundaries.write_bytes(
+            b"# ## A\n\x0c\n# ## B\rx = 1\r  # ## C\r\n\xe2\x80\xa8\n# ## D\n"
+        )
+        for input_file in [
+            project_root / "tests" / "input" / "python_black.py",
+            project_root / "tests" / "input" / "r_simple.R",
+            project_root / "tests" / "input" / "cobol_simple.cob",
+            project_root / "tests" / "input" / "sql_empty.sql",
+            crlf,
+            boundaries,
+        ]:
+            with self.subTest(input_file=input_file.name):
+                t = Toc(input_file)
+                t.set_character()
+                expected = t._toc_headings()
+                t = Toc(input_file)
+                t.set_character()
+                t.streamSize = 0
+                with patch.object(Toc, "_process_generic") as process:
+                    t._stream_headings()
+                process.assert_not_called()
+                self.assertEqual(t._headings, expected)
+        self.assertEqual(
+            expected,
+            [
+                Heading(6, "A", 1),
+                Heading(6, "B", 3),
+                Heading(6, "C", 5),
+                Heading(6, "D", 7),
+            ],
+        )
+
+    def test_write_unchanged(self):
+        output_file = project_root / "tests" / "output" / "unchanged.py"
+        shutil.copy(project_root / "tests" / "input" / "python_shebang.py", output_file)
+        t = Toc(output_file)
+        t.to_file()
+        self.assertIsNone(t.err)
+        # the same content is never written again
+        with patch.object(Toc, "_replace_file") as replace:
+            t = Toc(output_file)
+            t.to_file()
+            self.assertEqual(t.err, "same")
+            replace.assert_not_called()
+
+    def test_write_chunks(self):
+        # large documents are written in pieces around the toc, never copied as a whole
+        input_file = project_root / "tests" / "output" / "chunks.py"
+        output_file = project_root / "tests" / "output" / "chunks_output.py"
+        output_file.unlink(missing_ok=True)
+        body = "".join(f"# ## Heading {i}\n" + "x = 1\n" * 5000 for i in range(100))
+        input_file.write_text("#!/usr/bin/env python\n" + body)
+        t = Toc(input_file)
+        t.set_character()
+        splice, existing = t._splice()
+        self.assertFalse(existing)
+        # inserted after the shebang, nothing is replaced
+        self.assertEqual(splice.start, splice.end)
+        self.assertEqual(splice.start, len("#!/usr/bin/env python"))
+        expected, _ = t._compose()
+        self.assertGreater(len(list(t._chunks(splice))), 2)
+        for expected_err in [None, "same"]:
+            t = Toc(input_file)
+            t.set_character()
+            t.to_file(output_file)
+            self.assertEqual(t.err, expected_err)
+        self.assertEqual(output_file.read_text(), expected)
+
+    def test_records(self):
+        # raw headings, with the byte offset of the line they start on
+        input_file = project_root / "tests" / "output" / "records.py"
+        input_file.write_text(
+            f"x = 1\n# {'#' * 64} Café\n\n# {'#' * 32} Über\n", encoding="utf-8"
+        )
+        t = Toc(input_file)
+        t.set_character()
+        records = t.records()
+        data = input_file.read_bytes()
+        self.assertEqual([r["level"] for r in records], [1, 2])
+        self.assertEqual([r["line"] for r in records], [2, 4])
+        self.assertEqual(
+            [r["offset"] for r in records], [6, data.index("# ##".encode(), 10)]
+        )
+        self.assertEqual(records[1]["text"], "Über")
+        self.assertEqual(records[0]["file"], str(input_file))
+
+    def test_write_backslashes(self):
+        output_file = project_root / "tests" / "output" / "backslashes.tex"
+        output_file.write_text("\\section{Title}\n\\subsection{Subtitle}\n")
+        for _ in range(2):
+            t = Toc(output_file)
+            t.set_character()
+            t.to_file()
+        # backslashes in the toc are not interpreted as escapes
+        self.assertEqual(t.err, "same")
+        self.assertIn("Subtitle", output_file.read_text())
+
+    def test_write_atomic(self):
+        output_dir = project_root / "tests" / "output" / "atomic"
+        shutil.rmtree(output_dir, ignore_errors=True)
+        Path.mkdir(output_dir, parents=True)
+        output_file = output_dir / "atomic.py"
+        shutil.copy(project_root / "tests" / "input" / "python_shebang.py", output_file)
+        output_file.chmod(0o640)
+        with patch("os.fsync") as fsync:
+            t = Toc(output_file)
+            t.fsync = True
+            t.to_file()
+            fsync.assert_called()
+        self.assertIsNone(t.err)
+        self.assertEqual(output_file.stat().st_mode & 0o777, 0o640)
+        # no temporary file is left behind
+        self.assertEqual(list(output_dir.iterdir()), [output_file])
+
+    def test_line_numbers_single_pass(self):
+        # line numbers written in a single pass must already account for the toc itself
+        output_dir = project_root / "tests" / "output" / "line_numbers"
+        Path.mkdir(output_dir, parents=True, exist_ok=True)
+        for name in [
+            "html_tags.html",
+            "markdown_yaml_frontmatter.md",
+            "python_broken_toc.py",
+            "python_docstring.py",
+            "restructuredtext_simple.rst",
+            "rust_first_line_empty.rs",
+        ]:
+            with self.subTest(name=name):
+                output_file = output_dir / name
+                shutil.copy(project_root / "tests" / "input" / name, output_file)
+                for expected_err in [None, "same"]:
+                    t = Toc(output_file)
+                    t.set_character()
+                    t.lineNumbers = True
+                    t.to_file()
+                    self.assertEqual(t.err, expected_err)
+
+    def test_patterns_shared(self):
+        t1 = Toc(Path("a.py"))
+        t2 = Toc(Path("b.py"))
+        # compiled once and reused by every object with the same comment character
+        self.assertIs(t1._toc_pattern(), t2._toc_pattern())
+        t2.character = "//"
+        self.assertIsNot(t1._toc_pattern(), t2._toc_pattern())
+
+    def test_patterns_escaped(self):
+        # comment characters with regex metacharacters update their toc instead of adding another one
+        output_dir = project_root / "tests" / "output" / "escaped"
+        Path.mkdir(output_dir, parents=True, exist_ok=True)
+        for name in ["cobol_simple.cob", "man_simple.1"]:
+            with self.subTest(name=name):
+                output_file = output_dir / name
+                shutil.copy(project_root / "tests" / "input" / name, output_file)
+                for expected_err in [None, "same"]:
+                    t = Toc(output_file)
+                    t.set_character()
+                    t.to_file()
+                    self.assertEqual(t.err, expected_err)
+
+    def test_check(self):
+        output_file = project_root / "tests" / "output" / "check.py"
+        shutil.copy(project_root / "tests" / "input" / "python_shebang.py", output_file)
+        with patch.object(Toc, "_replace_file") as replace:
+            t = Toc(output_file)
+            t.set_character()
+            self.assertTrue(t.check())
+            self.assertEqual(t.err, "outdated")
+            replace.assert_not_called()
+        t.to_file()
+        t = Toc(output_file)
+        t.set_character()
+        self.assertFalse(t.check())
+        self.assertEqual(t.err, "same")
+
+    def test_from_string(self):
+        input_file = project_root / "tests" / "input" / "python_shebang.py"
+        output_file = project_root / "tests" / "output" / "from_string.py"
+        shutil.copy(input_file, output_file)
+        t = Toc(output_file)
+        t.set_character()
+        t.to_file()
+        text = input_file.read_text()
+        # strings are never read from or written to disk
+        with patch("builtins.open", side_effect=AssertionError), patch("sys.stdin"):
+            t = Toc.from_string(text, path="from_string.py")
+            self.assertIn("Contents of from_string.py", t.generate())
+            self.assertEqual(t.apply(), (output_file.read_text(), None))
+            self.assertEqual(t.apply(t.apply()[0]), (output_file.read_text(), None))
+            t = Toc.from_string("no headings", extension="py")
+            self.assertEqual(t.apply(), ("no headings", "empty"))
+            # the error belongs to that text only
+            self.assertIsNone(t.err)
+            self.assertIsNone(t.apply("# ## Heading\n")[1])
+
+    def test_apply_threads(self):
+        # a single object can apply the toc to many documents at once
+        t = Toc.from_string("", extension="md")
+        texts = [f"# Title {i}\n\n## Subtitle {i}\n" for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(t.apply, texts))
+        for i, (result, err) in enumerate(results):
+            self.assertIn(f"Subtitle {i}", result)
+            self.assertTrue(result.endswith(texts[i]))
+            self.assertIsNone(err)
+        self.assertIsNone(t.err)
+        self.assertEqual(t.messages, [])
+
+    def test_edit(self):
+        documents = {
+            "md": ["# Title", "text", "## Section", "text", "## Other", "text"],
+            "tex": ["\\chapter{Title}", "text", "\\section{Section}", "text"],
+            "py": [f"# {'#' * 64} Title", "x = 1", f"# {'#' * 32} Section", "y = 2"],
+            "html": ["<h1>Title</h1>", "<p>text</p>", "<h2>Section</h2>"],
+        }
+        edits = [(2, 1, "# New\n"), (1, 0, "text\n\n"), (3, 2, ""), (1, 1, "x")]
+        for extension, lines in documents.items():
+            with self.subTest(extension=extension):
+                t = Toc.from_string("\n".join(lines) + "\n", extension)
+                t.generate()
+                for line, count, text in edits:
+                    t.edit(line, count, text)
+                    lines[line - 1 : line - 1 + count] = text.splitlines()
+                    self.assertEqual(t._read_file(), "\n".join(lines) + "\n")
+                    # same headings as parsing the edited document from scratch
+                    expected = Toc.from_string(t._read_file(), extension)
+                    self.assertEqual(t._toc_headings(), expected._toc_headings())
+                    self.assertEqual(t.generate(), expected.generate())
+        with self.assertRaises(ValueError):
+            t.edit(len(lines) + 1, 1, "")
+
+    def test_edit_cost(self):
+        # only the new lines are parsed, however long the document is
+        t = Toc.from_string("# Title\n" + "text\n## Section\n" * 10000, "md")
+        t.generate()
+        t.profile = Profile("edit.md")
+        t.edit(5000, 2, "## New\ntext\n## Newer\n")
+        self.assertEqual(t.profile.counters["regex"], 3)
+        self.assertEqual(t.profile.counters["headings"], 2)
+        self.assertEqual(
+            t._toc_headings()[2499:2503],
+            [
+                Heading(2, "Section", 4999),
+                Heading(2, "New", 5000),
+                Heading(2, "Newer", 5002),
+                Heading(2, "Section", 5004),
+            ],
+        )
+        self.assertEqual(t._toc_headings()[-1], Heading(2, "Section", 20002))
+
 
 # ################################ FILE PROCESSING
 
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of test_watch.py                                     │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── TEST CLASSES
+# ├── ENTRYPOINT
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# test
+import unittest
+
+# clean output path if existing
+import shutil
+
+# stats of the processed files
+import os
+
+# run the watcher in the background
+import threading
+import time
+from contextlib import contextmanager
+
+# current directory
+from pathlib import Path
+
+# load local module rather than system installed version
+import sys
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+# module to test
+from toc.watch import Inotify, Poller, backend, watch
+
+# ################################################################ TEST CLASSES
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.o = project_root / "tests" / "output" / "watch"
+        shutil.rmtree(self.o, ignore_errors=True)
+        Path.mkdir(self.o, parents=True, exist_ok=True)
+        self.a = self.o / "a.py"
+        self.b = self.o / "b.py"
+        self.a.write_text("a\n")
+        self.b.write_text("b\n")
+        self.calls: list[list[Path]] = []
+
+    def process(self, files: list[Path]) -> dict[Path, os.stat_result]:
+        # like toc -f, write every processed file again and return the stats of these writes
+        self.calls.append(files)
+        written = {}
+        for path in files:
+            path.write_text(path.read_text() + "processed\n")
+            written[path] = os.stat(path)
+        return written
+
+    def wait_for(self, condition, timeout: float = 5.0) -> bool:
+        # poll rather than sleep a fixed time, so that slow machines only make the tests slower
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    @contextmanager
+    def watching(self, notifier, process=None, **kwargs):
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=watch,
+            args=([self.a, self.b], process or self.process),
+            kwargs={"delay": 0.3, "notifier": notifier, "stop": stop, **kwargs},
+        )
+        thread.start()
+        try:
+            # files are watched once their signatures are taken
+            self.assertTrue(
+                self.wait_for(
+                    lambda: bool(
+                        notifier.paths
+                        if isinstance(notifier, Poller)
+                        else notifier.targets
+                    )
+                )
+            )
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def assertCalls(self, expected: list[list[Path]]) -> None:
+        # a call that should not happen makes the expected calls unreachable
+        self.wait_for(lambda: self.calls == expected)
+        self.assertEqual(self.calls, expected)
+
+    def notifiers(self):
+        yield Poller(0.05)
+        if isinstance(backend(), Inotify):
+            yield Inotify()
+
+    def test_debounce(self):
+        for notifier in self.notifiers():
+            with self.subTest(notifier=type(notifier).__name__):
+                self.calls = []
+                with self.watching(notifier):
+                    # a burst of saves is processed once
+                    for i in range(3):
+                        self.a.write_text(f"a{i}\n")
+                        time.sleep(0.02)
+                    self.assertCalls([[self.a]])
+                    # the writes of process() are ignored, so only the change of another file is processed
+                    self.b.write_text("b1\n")
+                    self.assertCalls([[self.a], [self.b]])
+                self.assertEqual(self.a.read_text(), "a2\nprocessed\n")
+
+    def test_save_while_processing(self):
+        # a save racing with the writes of process() is not taken for one of them
+        def process(files: list[Path]) -> dict[Path, os.stat_result]:
+            written = self.process(files)
+            if len(self.calls) == 1:
+                self.a.write_text("a1\n")
+            return written
+
+        for notifier in self.notifiers():
+            with self.subTest(notifier=type(notifier).__name__):
+                self.calls = []
+                self.a.write_text("a\n")
+                with self.watching(notifier, process=process):
+                    self.a.write_text("a0\n")
+                    self.assertCalls([[self.a], [self.a]])
+                self.assertEqual(self.a.read_text(), "a1\nprocessed\n")
+
+    def test_lists(self):
+        # newly listed files are processed, as well as the changed ones
+        files = self.o / "files.txt"
+        files.write_text("a.py\n")
+        c = self.o / "c.py"
+        c.write_text("c\n")
+
+        for notifier in self.notifiers():
+            with self.subTest(notifier=type(notifier).__name__):
+                self.calls = []
+                with self.watching(
+                    notifier, lists=[files], expand=lambda: [self.a, self.b, c]
+                ):
+                    files.write_text("a.py\nb.py\nc.py\n")
+                    self.assertCalls([[c]])
+                    # then a change of a listed file
+                    self.b.write_text("b1\n")
+                    self.assertCalls([[c], [self.b]])
+
+
+# ################################################################ ENTRYPOINT
+
+if __name__ == "__main__":
+    unittest.main(buffer=True)
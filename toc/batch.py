@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of batch.py                                          │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CLASSES
+# ├── FUNCTIONS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# timings
+from time import perf_counter
+
+# parallel processing, importing the process pool only when needed
+from itertools import repeat
+from os import cpu_count, stat_result
+
+# files
+from pathlib import Path
+
+# options and results
+from typing import Iterable, Iterator, NamedTuple
+
+# toc library
+from toc.toc import Toc
+from toc.profiling import Profile
+
+# ################################################################ CLASSES
+
+
+class Options(NamedTuple):
+    # how every file is processed, like the flags of the command line
+    # "toc" only generates the toc, "file" adds or updates it in the file, "check" tells whether it is outdated
+    # "headings" only parses the headings, returning them as records
+    mode: str = "toc"
+    character: str | None = None
+    extension: str | None = None
+    depth: int = 0
+    lineNumbers: bool = False
+    # write to this file instead of the processed one, in "file" mode
+    output: Path | None = None
+    fsync: bool = False
+    # record the time spent in each phase, slowing down parsing
+    profile: bool = False
+    # number of worker processes, 0 for one per cpu
+    jobs: int = 1
+
+
+class Result(NamedTuple):
+    # outcome of processing a single file
+    path: Path
+    # "added", "updated", "generated" or "parsed" on success, otherwise the error set by Toc, such as "same", "outdated" or "notfound"
+    status: str
+    # None on success, as returned by the command line
+    err: str | None
+    headings: int
+    bytesWritten: int
+    seconds: float
+    # the toc in "toc" mode, "" otherwise
+    toc: str = ""
+    profile: Profile | None = None
+    # file, level, text, line and byte offset of every heading in "headings" mode
+    records: list[dict] | None = None
+    # what the command line would have printed to stderr
+    messages: list[str] | None = None
+    # stat of the written file, if any
+    writtenStat: stat_result | None = None
+
+
+# ################################################################ FUNCTIONS
+
+
+def process_one(path: Path, options: Options = Options()) -> Result:
+    # process a single file without printing anything
+    if options.mode not in ("toc", "file", "check", "headings"):
+        raise ValueError(f'Unknown mode "{options.mode}"')
+    _start = perf_counter()
+    t = Toc(path)
+    t.quiet = True
+    t.extension = options.extension or t.extension
+    t.character = options.character or t.set_character()
+    t.depth = options.depth
+    t.lineNumbers = options.lineNumbers
+    t.outputFile = options.output
+    t.fsync = options.fsync
+    t.profile = Profile(str(path)) if options.profile else None
+    _toc = ""
+    _records = None
+    # parse once before acting, as writing the file drops the parsed headings
+    if options.mode == "toc":
+        t._stream_headings()
+    _headings = len(t._toc_headings())
+    match options.mode:
+        case "toc":
+            _toc = t.generate()
+        case "file":
+            t.to_file()
+        case "check":
+            t.check()
+        case "headings":
+            _records = t.records()
+    return Result(
+        path,
+        t.err or t.action or ("parsed" if options.mode == "headings" else "generated"),
+        t.err,
+        _headings,
+        t.bytesWritten,
+        perf_counter() - _start,
+        _toc,
+        t.profile,
+        _records,
+        t.messages,
+        t.writtenStat,
+    )
+
+
+def process_many(
+    paths: Iterable[Path], options: Options = Options()
+) -> Iterator[Result]:
+    # yield the result of every file in input order, without printing anything
+    # logging and summaries are left to the caller
+    if options.jobs < 0:
+        raise ValueError(f"jobs must be 0 or more, not {options.jobs}")
+    if options.jobs == 1:
+        for _path in paths:
+            yield process_one(_path, options)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    # stdin can only be read by the main process
+    _paths = list(paths)
+    if Path("-") in _paths or len(_paths) < 2:
+        yield from process_many(_paths, options._replace(jobs=1))
+        return
+    _jobs = options.jobs if options.jobs > 0 else (cpu_count() or 1)
+    # send files in batches to reduce inter-process communication for long lists
+    _chunksize = max(1, len(_paths) // (_jobs * 4))
+    with ProcessPoolExecutor(max_workers=_jobs) as executor:
+        yield from executor.map(
+            process_one, _paths, repeat(options), chunksize=_chunksize
+        )
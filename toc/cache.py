@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of cache.py                                          │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├──┐CLASSES
+# │  ├── PUBLIC METHODS
+# │  └── INTERNAL METHODS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# hash file content
+import hashlib
+
+# serialize entries
+import json
+
+# environment variables, stat and atomic rename
+import os
+
+# least recently used entries are evicted first
+from collections import OrderedDict
+
+# files
+from pathlib import Path
+
+# ################################################################ CLASSES
+
+
+class Cache:
+    # remember files whose toc was up-to-date, so they can be skipped without being opened
+    # entries are keyed by path and output options, and store mtime, size and content hash
+    version: int = 1
+
+    def __init__(self, cacheFile: Path, options: str = "", maxEntries: int = 100000):
+        self.cacheFile: Path = cacheFile
+        self.options: str = options
+        self.maxEntries: int = maxEntries
+        self.entries: OrderedDict[str, list] = OrderedDict()
+        self.changed: bool = False
+
+    # ################################ PUBLIC METHODS
+
+    @staticmethod
+    def default_file() -> Path:
+        # follow the xdg base directory specification
+        _cacheHome = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+        return Path(_cacheHome) / "toc" / "cache.json"
+
+    def load(self) -> "Cache":
+        # a missing or corrupted cache is simply treated as empty
+        try:
+            with open(self.cacheFile, "r") as f:
+                _content = json.load(f)
+            if _content.get("version") == self.version:
+                self.entries = OrderedDict(_content["entries"])
+        except (OSError, ValueError, KeyError, AttributeError):
+            self.entries = OrderedDict()
+        return self
+
+    def save(self) -> None:
+        # write the cache atomically, evicting the least recently used entries
+        if not self.changed:
+            return
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
+        _tmpFile = self.cacheFile.with_name(f".{self.cacheFile.name}.{os.getpid()}")
+        try:
+            self.cacheFile.parent.mkdir(parents=True, exist_ok=True)
+            with open(_tmpFile, "w") as f:
+                json.dump({"version": self.version, "entries": self.entries}, f)
+            os.replace(_tmpFile, self.cacheFile)
+            self.changed = False
+        except OSError:
+            # the cache is only an optimization, never fail because of it
+            _tmpFile.unlink(missing_ok=True)
+
+    def fresh(self, inputFile: Path) -> bool:
+        # true if the file has not changed since its toc was last found up-to-date
+        _key = self._key(inputFile)
+        _entry = self.entries.get(_key)
+        if _entry is None:
+            return False
+        try:
+            _stat = os.stat(inputFile)
+        except OSError:
+            return False
+        _mtime, _size, _hash = _entry
+        if _stat.st_size != _size:
+            return False
+        if _stat.st_mtime_ns != _mtime:
+            # touched but maybe not modified (e.g. git checkout), compare content
+            if self._hash(inputFile) != _hash:
+                return False
+            _entry[0] = _stat.st_mtime_ns
+        self.entries.move_to_end(_key)
+        self.changed = True
+        return True
+
+    def store(self, inputFile: Path) -> None:
+        # remember a file whose toc is now up-to-date
+        try:
+            _stat = os.stat(inputFile)
+            _hash = self._hash(inputFile)
+        except OSError:
+            return
+        _key = self._key(inputFile)
+        self.entries[_key] = [_stat.st_mtime_ns, _stat.st_size, _hash]
+        self.entries.move_to_end(_key)
+        self.changed = True
+
+    # ################################ INTERNAL METHODS
+
+    def _key(self, inputFile: Path) -> str:
+        # the same file processed with different options needs a different toc
+        return f"{os.path.abspath(inputFile)}\n{self.options}"
+
+    @staticmethod
+    def _hash(inputFile: Path) -> str:
+        _hash = hashlib.blake2b(digest_size=16)
+        with open(inputFile, "rb") as f:
+            while _chunk := f.read(1 << 20):
+                _hash.update(_chunk)
+        return _hash.hexdigest()
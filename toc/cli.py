@@ -5,6 +5,7 @@
 # ├───────────────────────────────────────────────────────────────┘
 # │
 # ├── MODULES
+# ├── CLASSES
 # ├──┐FUNCTIONS
 # │  ├── ARGUMENTS
 # │  ├── PROCESS FILE
@@ -26,20 +27,56 @@ from argparse import RawDescriptionHelpFormatter
 # stderr
 import sys
 
-# glob expansion
-# import glob
+# capture worker output to print it in input order
+from io import StringIO
+from contextlib import redirect_stderr, redirect_stdout
 
-# version
-from importlib_metadata import version
+# parallel processing, importing the process pool only when needed
+from itertools import repeat
+from os import cpu_count
+from typing import TYPE_CHECKING, Iterator
 
 # robust file handling
+import os
 from pathlib import Path
 
 # toc library
 from toc.toc import Toc
 
-# needed for cprofile, pprofile and memray
-# from toc import Toc
+# skip unchanged files and profile runs, importing these modules only when needed
+if TYPE_CHECKING:
+    from collections import Counter
+
+    from toc.batch import Options
+    from toc.cache import Cache
+    from toc.profiling import Profile
+
+# ################################################################ CLASSES
+
+
+class RecordPrinter:
+    # print heading records as json lines, or as a json array formatted like json.dumps(records, indent=4)
+    # records are printed as soon as each file is parsed, so the array is only closed by close()
+    def __init__(self, format: str):
+        self.format: str = format
+        self.count: int = 0
+
+    def print(self, records: list[dict]) -> None:
+        # imported here, as most runs only print tocs
+        import json
+
+        for record in records:
+            if self.format == "json":
+                _record = json.dumps(record, indent=4).replace("\n", "\n    ")
+                sys.stdout.write(("[\n    " if not self.count else ",\n    ") + _record)
+            else:
+                sys.stdout.write(json.dumps(record) + "\n")
+            self.count += 1
+
+    def close(self) -> None:
+        if self.format == "json":
+            print("\n]" if self.count else "[]")
+
 
 # ################################################################ FUNCTIONS
 # ################################ ARGUMENTS
@@ -71,6 +108,17 @@ example comments:
         type=Path,
         help="files or lists of files to process. use '-' to read from stdin",
     )
+    changes = parser.add_mutually_exclusive_group()
+    changes.add_argument(
+        "--changed-since",
+        metavar="REV",
+        help="only process files changed since this git revision, or not yet tracked",
+    )
+    changes.add_argument(
+        "--staged",
+        action="store_true",
+        help="only process files staged in the git index",
+    )
     parser.add_argument(
         "-c",
         action="store",
@@ -86,12 +134,42 @@ example comments:
         type=str,
         help="interpret input as a file with this extension (e.g. html)",
     )
-    parser.add_argument(
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with an error if any toc is outdated, without writing files",
+    )
+    mode.add_argument(
         "-f",
         "--to-file",
         action="store_true",
         help="add or update toc in the original file",
     )
+    parser.add_argument(
+        "--fsync",
+        action="store_true",
+        help="flush written files to disk before moving to the next one",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["toc", "json", "ndjson"],
+        default="toc",
+        help="print the headings as a json array or as one json object per line, instead of a toc",
+    )
+    parser.add_argument(
+        "--index",
+        type=Path,
+        metavar="DB",
+        help="store the headings of the files in this sqlite database, only parsing files that changed",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="process files in parallel with this many workers (0 for one per cpu)",
+    )
     group.add_argument(
         "-l",
         "--from-list",
@@ -101,6 +179,11 @@ example comments:
     parser.add_argument(
         "-n", "--line-numbers", action="store_true", help="print line numbers in toc"
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="process files even if they did not change since the last run",
+    )
     group.add_argument(
         "-o",
         action="store",
@@ -108,63 +191,448 @@ example comments:
         type=Path,
         help="print output to an arbitrary file",
     )
+    # a flag rather than an optional value, which would take the following file as its value
+    _profile = profile_from_environment()
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=_profile is not None,
+        help="print the time spent in each phase and counters of every file to stderr, also enabled by TOC_PROFILE",
+    )
+    parser.add_argument(
+        "--profile-format",
+        choices=["table", "json"],
+        default=_profile or "table",
+        help="format of the profiling report, json including every file (default: table)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=Path,
+        metavar="FILE",
+        help="save function-level statistics of the main process to a cProfile file",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        help="only print tocs and a summary of what happened to the files",
+    )
+    parser.add_argument(
+        "--query",
+        metavar="TEXT",
+        help="print the headings of the index containing this text, ignoring case",
+    )
+    parser.add_argument(
+        "--serve",
+        nargs="?",
+        const=Path("-"),
+        type=Path,
+        metavar="SOCKET",
+        help="keep running and answer json-rpc requests over stdio, or over a unix socket",
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="keep running and process files again when they change, and list files when they are expanded again",
+    )
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version="%(prog)s " + version("tableofcontents"),
+        action="store_true",
         help="show the current version and exit",
     )
     args = parser.parse_args()
+    if args.version:
+        # reading package metadata is slow, only do it when requested
+        from importlib.metadata import version
+
+        print(f"{parser.prog} {version('tableofcontents')}")
+        parser.exit()
+    if args.format != "toc" and (args.to_file or args.check or args.output_file):
+        parser.error("--format only applies when printing tocs")
+    if args.query is not None and args.index is None:
+        parser.error("--query requires --index")
+    if args.index and (args.to_file or args.check or args.output_file):
+        parser.error("--index never writes tocs")
+    if args.watch and (args.index or Path("-") in args.files):
+        parser.error("--watch only applies to files processed into tocs")
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or more")
     return args
 
 
+def profile_from_environment() -> str | None:
+    # TOC_PROFILE=1, true or yes prints a table, json a json report, and anything else such as 0 nothing
+    _value = os.environ.get("TOC_PROFILE", "").strip().lower()
+    if _value in ("1", "true", "yes", "table"):
+        return "table"
+    if _value == "json":
+        return "json"
+    return None
+
+
 def get_files(args) -> list[Path]:
     # consider all files as lists
     if args.from_list:
-        files = []
+        patterns = []
         for fileList in args.files:
             # try:
             if True:
                 with open(fileList, "r") as list_content:
                     for line in list_content.read().splitlines():
                         if not line.startswith("#") and line != "":
-                            # glob expansion
-                            files += [
-                                # globMatch for globMatch in glob.glob(line, recursive=True)
-                                globMatch
-                                for globMatch in Path.cwd().glob(line)
-                                if globMatch.exists() and globMatch.is_file()
-                            ]
+                            patterns.append(line)
             # cannot open that list
             # except BaseException:
             #    print(f'Skipping list "{fileList}"', file=sys.stderr)
+        # glob expansion of every pattern in a single directory walk, imported here as most runs list files directly
+        from toc.files import expand
+
+        files = expand(patterns)
     # only consider the first file
     elif args.output_file:
         files = [args.files[0]]
     # consider all files
     else:
         files = args.files
+    # only keep files touched in git, in the same order
+    changed = get_changed_files(args)
+    if changed is not None:
+        files = [f for f in files if os.path.abspath(f) in changed]
     return files
 
 
+def get_changed_files(args) -> set[str] | None:
+    # absolute paths of files modified since a revision or staged, read from the local repository
+    if args.changed_since is None and not args.staged:
+        return None
+    # imported here, as most runs do not need git
+    import subprocess
+
+    # paths relative to the current directory, like the globs of list files, excluding deleted files
+    diff = ["git", "diff", "--name-only", "-z", "--relative", "--diff-filter=d"]
+    commands = (
+        [diff + ["--cached"]]
+        if args.staged
+        else [
+            diff + [args.changed_since, "--"],
+            ["git", "ls-files", "--others", "--exclude-standard", "-z"],
+        ]
+    )
+    changed: set[str] = set()
+    for command in commands:
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            _reason = getattr(e, "stderr", None) or e
+            print(
+                f"Could not list changed files: {str(_reason).strip()}", file=sys.stderr
+            )
+            sys.exit(1)
+        changed.update(
+            os.path.abspath(_file) for _file in result.stdout.split("\0") if _file
+        )
+    return changed
+
+
 # ################################ PROCESS FILE
 
 
-def process_file(inputFile: Path, args):
+def process_file(
+    inputFile: Path,
+    args,
+    profiles: "list[Profile] | None" = None,
+    written: "dict[Path, os.stat_result] | None" = None,
+) -> str | None:
     # initialize instance
     t = Toc(inputFile)
+    # record timings and counters if a list is given
+    if profiles is not None:
+        from toc.profiling import Profile
+
+        t.profile = Profile(str(inputFile))
+        profiles.append(t.profile)
     # set comment character and line numbers
     t.extension = args.extension if args.extension else t.extension
     t.character = args.character if args.character else t.set_character()
     t.depth = args.depth if args.depth else t.depth
     t.lineNumbers = args.line_numbers if args.line_numbers else False
     t.outputFile = args.output_file if args.output_file else None
+    t.fsync = args.fsync
     # print output
-    if args.to_file or args.output_file:
+    if args.check:
+        t.check()
+    elif args.to_file or args.output_file:
         t.to_file()
     else:
         t.to_stdout()
+    # record the input files written in place if a dict is given
+    if written is not None and t.writtenStat is not None and not args.output_file:
+        written[inputFile] = t.writtenStat
+    return t.err
+
+
+def process_file_captured(
+    inputFile: Path, args
+) -> "tuple[str, str, str | None, list[Profile] | None, os.stat_result | None]":
+    # run in a worker process, returning stdout, stderr, timings and writes instead of printing them
+    _stdout, _stderr = StringIO(), StringIO()
+    _profiles: "list[Profile] | None" = [] if args.profile else None
+    _written: dict[Path, os.stat_result] = {}
+    with redirect_stdout(_stdout), redirect_stderr(_stderr):
+        err = process_file(inputFile, args, _profiles, _written)
+    return (
+        _stdout.getvalue(),
+        _stderr.getvalue(),
+        err,
+        _profiles,
+        _written.get(inputFile),
+    )
+
+
+def process_files(
+    files: list[Path],
+    args,
+    profiles: "list[Profile] | None" = None,
+    written: "dict[Path, os.stat_result] | None" = None,
+) -> Iterator[str | None]:
+    # process files and yield their outcome in input order
+    # stdin can only be read by the main process
+    if args.jobs != 1 and len(files) > 1 and Path("-") not in files:
+        yield from process_files_parallel(files, args, profiles, written)
+    else:
+        # process all files individually
+        for inputFile in files:
+            yield process_file(inputFile, args, profiles, written)
+
+
+def process_files_parallel(
+    files: list[Path],
+    args,
+    profiles: "list[Profile] | None" = None,
+    written: "dict[Path, os.stat_result] | None" = None,
+) -> Iterator[str | None]:
+    # distribute files to a pool of workers, printing their output in input order
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = args.jobs if args.jobs > 0 else (cpu_count() or 1)
+    # send files in batches to reduce inter-process communication for long lists
+    chunksize = max(1, len(files) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for inputFile, (_stdout, _stderr, err, _profiles, _stat) in zip(
+            files,
+            executor.map(
+                process_file_captured, files, repeat(args), chunksize=chunksize
+            ),
+        ):
+            sys.stdout.write(_stdout)
+            sys.stderr.write(_stderr)
+            if profiles is not None and _profiles is not None:
+                profiles.extend(_profiles)
+            if written is not None and _stat is not None:
+                written[inputFile] = _stat
+            yield err
+
+
+def process_files_batch(
+    files: list[Path],
+    args,
+    profiles: "list[Profile] | None",
+    summary: "Counter[str] | None",
+    printer: RecordPrinter,
+    written: "dict[Path, os.stat_result] | None" = None,
+) -> Iterator[str | None]:
+    # same outcomes as process_files, but files are processed by the batch api that never prints
+    # messages are replaced by a summary if given, heading records are printed as soon as each file is parsed
+    from toc.batch import process_many
+
+    for result in process_many(files, get_options(args)):
+        if result.toc:
+            print(result.toc)
+        printer.print(result.records or [])
+        if summary is not None:
+            summary[result.status] += 1
+        else:
+            for message in result.messages or []:
+                print(message, file=sys.stderr)
+        if profiles is not None and result.profile is not None:
+            profiles.append(result.profile)
+        if (
+            written is not None
+            and result.writtenStat is not None
+            and not args.output_file
+        ):
+            written[result.path] = result.writtenStat
+        yield result.err
+
+
+def index_files(files: list[Path], args, profiles: "list[Profile] | None") -> None:
+    # update the index with the files that changed, then search it
+    # parsing options are part of the index, as they change the headings found
+    from collections import Counter
+
+    from toc.batch import process_many
+    from toc.index import Index
+
+    index = Index(args.index, f"{args.character}|{args.extension}").open()
+    try:
+        if files:
+            summary: "Counter[str]" = Counter()
+            stale = index.stale(files)
+            summary["unchanged"] = len(files) - len(stale)
+            options = get_options(args)._replace(mode="headings", depth=0)
+            for result in process_many(stale, options):
+                index.store(result)
+                summary[result.status] += 1
+                if profiles is not None and result.profile is not None:
+                    profiles.append(result.profile)
+            # only files next to or below the processed ones may have been deleted
+            summary["removed"] = index.prune(
+                {os.path.dirname(os.path.abspath(path)) for path in files}
+            )
+            print(
+                f"{len(files)} files: "
+                + ", ".join(
+                    f"{count} {status}"
+                    for status, count in summary.most_common()
+                    if count
+                ),
+                file=sys.stderr,
+            )
+        if args.query is not None:
+            records = index.search(args.query)
+            if args.format != "toc":
+                printer = RecordPrinter(args.format)
+                printer.print(records)
+                printer.close()
+            else:
+                # like grep -n, understood by most editors, with paths relative to the current directory if below it
+                cwd = Path.cwd()
+                for record in records:
+                    path = Path(record["file"])
+                    if path.is_relative_to(cwd):
+                        path = path.relative_to(cwd)
+                    print(f"{path}:{record['line']}: {record['text']}")
+    finally:
+        index.close()
+
+
+def get_options(args) -> "Options":
+    # batch options matching the command line flags
+    from toc.batch import Options
+
+    return Options(
+        mode="check"
+        if args.check
+        else "file"
+        if args.to_file or args.output_file
+        else "headings"
+        if args.format != "toc"
+        else "toc",
+        character=args.character,
+        extension=args.extension,
+        depth=args.depth or 0,
+        lineNumbers=args.line_numbers,
+        output=args.output_file,
+        fsync=args.fsync,
+        profile=bool(args.profile),
+        jobs=args.jobs,
+    )
+
+
+def get_cache(args) -> "Cache | None":
+    # only files updated or checked in place can be skipped, as other modes need the toc output
+    if args.no_cache or not (args.to_file or args.check) or args.output_file:
+        return None
+    from toc.cache import Cache
+    from toc.languages import config_file
+
+    # the same file needs a different toc if any of these options changes
+    options = f"{args.character}|{args.depth}|{args.line_numbers}|{args.extension}"
+    # or after upgrading toc or editing the user languages
+    # reading the package version from its metadata would take longer than most cached runs,
+    # but every installation rewrites the modules that generate the toc
+    package = Path(__file__).parent
+    for path in [package / "toc.py", package / "languages.py", config_file()]:
+        options += f"|{file_signature(path)}"
+    return Cache(Cache.default_file(), options).load()
+
+
+def file_signature(path: Path) -> str:
+    # modification time and size of a file, or "-" if it does not exist
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def process_all_files(
+    files: list[Path],
+    args,
+    profiles: "list[Profile] | None",
+    written: "dict[Path, os.stat_result] | None" = None,
+) -> int:
+    # print or write the tocs, skipping cached files, and return how many are outdated
+    # the stats of the input files written in place are recorded if a dict is given
+    cache = get_cache(args)
+    # a stat call is enough to skip files that did not change since the last run
+    fresh = [cache is not None and cache.fresh(inputFile) for inputFile in files]
+    todo = [inputFile for inputFile, skip in zip(files, fresh) if not skip]
+    summary: "Counter[str] | None" = None
+    if args.quiet:
+        from collections import Counter
+
+        summary = Counter()
+    printer = RecordPrinter(args.format)
+    if args.quiet or args.format != "toc":
+        outcomes = process_files_batch(todo, args, profiles, summary, printer, written)
+    else:
+        outcomes = process_files(todo, args, profiles, written)
+    outdated = 0
+    for inputFile, skip in zip(files, fresh):
+        if skip:
+            if summary is not None:
+                summary["cached"] += 1
+            elif not args.check:
+                print(f'Skipping unchanged toc in "{inputFile}"', file=sys.stderr)
+            continue
+        err = next(outcomes)
+        outdated += err == "outdated"
+        # the toc of this file has just been added, updated or found up-to-date
+        if cache is not None and err in (None, "same"):
+            cache.store(inputFile)
+    if cache is not None:
+        cache.save()
+    printer.close()
+    if summary:
+        print(
+            f"{len(files)} files: "
+            + ", ".join(f"{count} {status}" for status, count in summary.most_common()),
+            file=sys.stderr,
+        )
+    return outdated
+
+
+def watch_files(files: list[Path], args) -> None:
+    # process the files again whenever they change, until interrupted
+    # imported here, as most runs exit right away
+    from toc.watch import watch
+
+    def process(changed: list[Path]) -> dict[Path, os.stat_result]:
+        # report our own writes, so that only later changes process the files again
+        written: dict[Path, os.stat_result] = {}
+        process_all_files(changed, args, None, written)
+        return written
+
+    print("Watching files for changes, press Ctrl+C to stop", file=sys.stderr)
+    watch(
+        files,
+        process,
+        lists=args.files if args.from_list else None,
+        expand=lambda: get_files(args),
+    )
 
 
 # ################################ MAIN
@@ -174,12 +642,43 @@ def main() -> None:
     # parse arguments
     # print(sys.argv)
     args = parse_args()
+    if args.serve:
+        # imported here, as most runs do not need a server
+        from toc.server import main as serve
+
+        serve(None if args.serve == Path("-") else args.serve)
+        return
+    profiles: "list[Profile] | None" = [] if args.profile else None
+    profiler = None
+    if args.cprofile:
+        # imported here, as most runs are not profiled
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
     files = get_files(args)
-    # process all files individually
-    for inputFile in files:
-        process_file(inputFile, args)
-    if not files:
-        print("No files provided", file=sys.stderr)
+    outdated = 0
+    if args.index:
+        index_files(files, args, profiles)
+    else:
+        outdated = process_all_files(files, args, profiles)
+        if args.watch:
+            watch_files(files, args)
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if profiles is not None:
+        from toc.profiling import report
+
+        print(report(profiles, args.profile_format), file=sys.stderr)
+    if not files and args.query is None:
+        if args.files and (args.changed_since is not None or args.staged):
+            print("No changed files", file=sys.stderr)
+        else:
+            print("No files provided", file=sys.stderr)
+    if outdated:
+        print(f"{outdated} of {len(files)} files have an outdated toc", file=sys.stderr)
+        sys.exit(1)
 
 
 # ################################################################ ENTRY POINT
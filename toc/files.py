@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of files.py                                          │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CLASSES
+# ├──┐FUNCTIONS
+# │  ├── PATTERNS
+# │  └── EXPANSION
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# translate glob patterns
+import re
+
+# walk directories
+import os
+
+# patterns outside of the current directory
+import glob
+
+# files
+from pathlib import Path
+
+# parsed patterns
+from typing import NamedTuple
+
+# ################################################################ CLASSES
+
+
+class Pattern(NamedTuple):
+    # a line of a list file, matched against paths relative to the current directory
+    # "!pattern" lines exclude files, "pattern/" lines only match directories
+    exclude: bool
+    directory: bool
+    # the whole relative path, and each of its components to prune the walk
+    regex: re.Pattern
+    parts: tuple[re.Pattern | None, ...]
+
+
+# ################################################################ FUNCTIONS
+# ################################ PATTERNS
+
+
+def parse(line: str) -> Pattern:
+    # "*" and "?" stay within a path component, "**" matches any number of them
+    # excludes follow gitignore: without a slash they match at any depth, otherwise from the current directory
+    _exclude = line.startswith("!")
+    _line = line[1:] if _exclude else line
+    _directory = _line.endswith("/")
+    _anchored = not _exclude or "/" in _line.strip("/")
+    _parts = [_part for _part in _line.split("/") if _part not in ("", ".")]
+    _regex = "" if _anchored else "(?:.*/)?"
+    for i, _part in enumerate(_parts):
+        if _part == "**":
+            _regex += ".*" if i == len(_parts) - 1 else "(?:.*/)?"
+        else:
+            _regex += _translate(_part) + ("/" if i < len(_parts) - 1 else "")
+    return Pattern(
+        _exclude,
+        _directory,
+        re.compile(_regex),
+        # None stands for "**"
+        tuple(
+            None if _part == "**" else re.compile(_translate(_part)) for _part in _parts
+        ),
+    )
+
+
+def _translate(part: str) -> str:
+    # regex for a single path component
+    _regex = ""
+    i = 0
+    while i < len(part):
+        c = part[i]
+        i += 1
+        if c == "*":
+            _regex += "[^/]*"
+        elif c == "?":
+            _regex += "[^/]"
+        elif c == "[" and part.find("]", i + 1) != -1:
+            # character class, "]" is literal right after "["
+            j = part.find("]", i + 1)
+            _class = part[i:j].replace("\\", "\\\\")
+            _regex += (
+                "[^/" + _class[1:] + "]" if _class.startswith("!") else f"[{_class}]"
+            )
+            i = j + 1
+        else:
+            _regex += re.escape(c)
+    return _regex
+
+
+def _could_contain(parts: tuple[str, ...], pattern: Pattern, recursive: bool) -> bool:
+    # whether files below the directory with these components may match an include pattern
+    for i, _part in enumerate(parts):
+        if i >= len(pattern.parts):
+            return False
+        _regex = pattern.parts[i]
+        if _regex is None:
+            return recursive
+        if i == len(pattern.parts) - 1 or not _regex.fullmatch(_part):
+            return False
+    return True
+
+
+# ################################ EXPANSION
+
+
+def expand(lines: list[str], root: Path | None = None) -> list[Path]:
+    # return the files matched by the lines of list files, walking the directory tree only once
+    # files are ordered by the first pattern matching them, then by path, and are never repeated
+    _root = root or Path.cwd()
+    _patterns = []
+    _outside = []
+    for _line in lines:
+        # absolute and parent paths cannot be reached by walking the current directory
+        if Path(_line.lstrip("!")).is_absolute() or ".." in _line.split("/"):
+            if not _line.startswith("!"):
+                _outside.append(_line)
+        elif _line.strip("!/."):
+            _patterns.append(parse(_line))
+    _includes = [p for p in _patterns if not p.exclude and not p.directory]
+    # most files are decided by a single regex, telling which include matched them first
+    _anyInclude = _combine(
+        (i, p) for i, p in enumerate(_patterns) if not p.exclude and not p.directory
+    )
+    _anyExclude = _combine(
+        (i, p) for i, p in enumerate(_patterns) if p.exclude and not p.directory
+    )
+    _anyExcludeDirectory = _combine(
+        (i, p) for i, p in enumerate(_patterns) if p.exclude
+    )
+    _found: dict[Path, tuple[int, tuple[str, ...]]] = {}
+    _stack: list[tuple[str, ...]] = [()]
+    while _includes and _stack:
+        _dirParts = _stack.pop()
+        try:
+            with os.scandir(_root.joinpath(*_dirParts)) as _entries:
+                for _entry in _entries:
+                    _parts = _dirParts + (_entry.name,)
+                    _relative = "/".join(_parts)
+                    if _entry.is_dir():
+                        # excluded directories are never entered, so their files cannot be included again
+                        if _anyExcludeDirectory.fullmatch(_relative):
+                            continue
+                        # like pathlib, "**" does not follow symbolic links
+                        _recursive = not _entry.is_symlink()
+                        if any(
+                            _could_contain(_parts, p, _recursive) for p in _includes
+                        ):
+                            _stack.append(_parts)
+                    elif _entry.is_file():
+                        _included = _anyInclude.fullmatch(_relative)
+                        if _included is None:
+                            continue
+                        if _anyExclude.fullmatch(_relative):
+                            _index = _decide(_relative, _patterns)
+                        else:
+                            _index = int(str(_included.lastgroup)[1:])
+                        if _index is not None:
+                            _found[_root.joinpath(*_parts)] = (_index, _parts)
+        except OSError:
+            continue
+    _files = sorted(_found, key=_found.__getitem__)
+    # rare, so each one is expanded on its own
+    for _line in _outside:
+        for _match in sorted(glob.glob(_line, recursive=True)):
+            _path = Path(_match)
+            if _path.is_file() and _path not in _found:
+                _found[_path] = (len(_patterns), ())
+                _files.append(_path)
+    return _files
+
+
+def _combine(patterns) -> re.Pattern:
+    # a single regex matching any of the patterns, with a group named after the index of each one
+    _alternatives = [f"(?P<p{i}>{p.regex.pattern})" for i, p in patterns]
+    # never matches if there are no patterns
+    return re.compile("|".join(_alternatives) or "(?!)")
+
+
+def _decide(relative: str, patterns: list[Pattern]) -> int | None:
+    # the last pattern matching a file decides whether it is included, as in gitignore
+    # return the index of the first include pattern matching it, used to sort files
+    _first = None
+    _included = False
+    for i, _pattern in enumerate(patterns):
+        if _pattern.directory or not _pattern.regex.fullmatch(relative):
+            continue
+        _included = not _pattern.exclude
+        if _included and _first is None:
+            _first = i
+    return _first if _included else None
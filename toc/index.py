@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of index.py                                          │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├──┐CLASSES
+# │  ├── PUBLIC METHODS
+# │  └── INTERNAL METHODS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# persistent heading index
+import sqlite3
+
+# stat and absolute paths
+import os
+
+# files
+from pathlib import Path
+
+# directories to prune
+from typing import Iterable
+
+# same change detection as the cache
+from toc.cache import Cache
+
+# parsed files
+from toc.batch import Result
+
+# ################################################################ CLASSES
+
+
+class Index:
+    # headings of many files in a sqlite database, to find them without parsing the files again
+    # files are keyed by absolute path, and only parsed again when their mtime, size, hash or parsing options change
+    # headings are searched through a trigram full-text index, if sqlite was built with fts5
+    version: int = 2
+
+    def __init__(self, indexFile: Path, options: str = ""):
+        self.indexFile: Path = indexFile
+        self.options: str = options
+        # set by open
+        self.connection: sqlite3.Connection
+        self.fulltext: bool = False
+
+    # ################################ PUBLIC METHODS
+
+    def open(self) -> "Index":
+        # an index written by another version is rebuilt from scratch
+        if self.indexFile.parent != Path(""):
+            self.indexFile.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.indexFile)
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] != self.version:
+            self.connection.executescript(
+                f"""
+                DROP TABLE IF EXISTS headings_text;
+                DROP TABLE IF EXISTS headings;
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE files (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    options TEXT NOT NULL,
+                    mtime INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    hash TEXT NOT NULL
+                );
+                CREATE TABLE headings (
+                    id INTEGER PRIMARY KEY,
+                    file INTEGER NOT NULL,
+                    level INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    line INTEGER NOT NULL,
+                    offset INTEGER NOT NULL
+                );
+                CREATE INDEX headings_file ON headings (file);
+                PRAGMA user_version = {self.version};
+                """
+            )
+            try:
+                # the full-text index is kept in sync with the headings by triggers
+                self.connection.executescript(
+                    """
+                    CREATE VIRTUAL TABLE headings_text USING fts5 (
+                        text, content = 'headings', content_rowid = 'id', tokenize = 'trigram'
+                    );
+                    CREATE TRIGGER headings_insert AFTER INSERT ON headings BEGIN
+                        INSERT INTO headings_text (rowid, text) VALUES (new.id, new.text);
+                    END;
+                    CREATE TRIGGER headings_delete AFTER DELETE ON headings BEGIN
+                        INSERT INTO headings_text (headings_text, rowid, text)
+                        VALUES ('delete', old.id, old.text);
+                    END;
+                    """
+                )
+            except sqlite3.OperationalError:
+                # fts5 or its trigram tokenizer (sqlite 3.34) are missing
+                pass
+        self.fulltext = (
+            self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'headings_text'"
+            ).fetchone()
+            is not None
+        )
+        return self
+
+    def close(self) -> None:
+        # changes are only saved here, in a single transaction
+        self.connection.commit()
+        self.connection.close()
+
+    def stale(self, files: list[Path]) -> list[Path]:
+        # files not indexed yet, or that changed since they were indexed
+        _stale = []
+        for _file in files:
+            # stdin cannot be found again
+            if _file == Path("-"):
+                continue
+            _row = self.connection.execute(
+                "SELECT id, options, mtime, size, hash FROM files WHERE path = ?",
+                (os.path.abspath(_file),),
+            ).fetchone()
+            try:
+                _stat = os.stat(_file)
+            except OSError:
+                # parsed anyway, to forget it and report the error
+                _stale.append(_file)
+                continue
+            if _row is None or _row[1] != self.options or _row[3] != _stat.st_size:
+                _stale.append(_file)
+            elif _row[2] != _stat.st_mtime_ns:
+                # touched but maybe not modified (e.g. git checkout), compare content
+                try:
+                    _hash = Cache._hash(_file)
+                except OSError:
+                    _stale.append(_file)
+                    continue
+                if _hash != _row[4]:
+                    _stale.append(_file)
+                else:
+                    self.connection.execute(
+                        "UPDATE files SET mtime = ? WHERE id = ?",
+                        (_stat.st_mtime_ns, _row[0]),
+                    )
+        return _stale
+
+    def store(self, result: Result) -> None:
+        # replace the headings of a parsed file, files that cannot be parsed are forgotten
+        _path = os.path.abspath(result.path)
+        self._forget(_path)
+        if result.err not in (None, "empty"):
+            return
+        try:
+            _stat = os.stat(result.path)
+            _hash = Cache._hash(result.path)
+        except OSError:
+            return
+        _id = self.connection.execute(
+            "INSERT INTO files (path, options, mtime, size, hash) VALUES (?, ?, ?, ?, ?)",
+            (_path, self.options, _stat.st_mtime_ns, _stat.st_size, _hash),
+        ).lastrowid
+        self.connection.executemany(
+            "INSERT INTO headings (file, level, text, line, offset) VALUES (?, ?, ?, ?, ?)",
+            (
+                (
+                    _id,
+                    _record["level"],
+                    _record["text"],
+                    _record["line"],
+                    _record["offset"],
+                )
+                for _record in result.records or []
+            ),
+        )
+
+    def prune(self, directories: Iterable[str]) -> int:
+        # forget indexed files below these absolute directories that no longer exist, return how many
+        # files elsewhere are never checked, so that indexing a few files stays fast in a large index
+        _missing = []
+        _prefixes: list[str] = []
+        for _directory in sorted({os.path.join(_d, "") for _d in directories}):
+            if _prefixes and _directory.startswith(_prefixes[-1]):
+                continue
+            _prefixes.append(_directory)
+            # a range of the unique index on paths, rather than a scan of every file
+            _missing += [
+                _path
+                for (_path,) in self.connection.execute(
+                    "SELECT path FROM files WHERE path >= ? AND path < ?",
+                    (_directory, _directory[:-1] + chr(ord(_directory[-1]) + 1)),
+                )
+                if not os.path.isfile(_path)
+            ]
+        for _path in _missing:
+            self._forget(_path)
+        return len(_missing)
+
+    def search(self, text: str) -> list[dict]:
+        # headings containing the text, ignoring case, in the same format as Toc.records
+        if self.fulltext and len(text) >= 3:
+            # a phrase of trigrams matches any heading containing the text, looked up in the full-text index
+            _rows = self.connection.execute(
+                """
+                SELECT files.path, level, headings.text, line, offset FROM headings_text
+                JOIN headings ON headings.id = headings_text.rowid
+                JOIN files ON files.id = headings.file
+                WHERE headings_text MATCH ?
+                ORDER BY files.path, line
+                """,
+                ('"' + text.replace('"', '""') + '"',),
+            )
+        else:
+            # shorter texts have no trigram and match most headings anyway, so every heading is scanned
+            _pattern = (
+                "%"
+                + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                + "%"
+            )
+            _rows = self.connection.execute(
+                """
+                SELECT files.path, level, text, line, offset FROM headings
+                JOIN files ON files.id = headings.file
+                WHERE text LIKE ? ESCAPE '\\'
+                ORDER BY files.path, line
+                """,
+                (_pattern,),
+            )
+        return [
+            {
+                "file": _path,
+                "level": _level,
+                "text": _text,
+                "line": _line,
+                "offset": _offset,
+            }
+            for _path, _level, _text, _line, _offset in _rows
+        ]
+
+    # ################################ INTERNAL METHODS
+
+    def _forget(self, path: str) -> None:
+        self.connection.execute(
+            "DELETE FROM headings WHERE file IN (SELECT id FROM files WHERE path = ?)",
+            (path,),
+        )
+        self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of languages.py                                      │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CONSTANTS
+# ├── CLASSES
+# ├──┐FUNCTIONS
+# │  ├── BUILT-IN LANGUAGES
+# │  └── REGISTRY
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# environment variables
+import os
+
+# stderr
+import sys
+
+# registry built once per process
+from functools import cache
+
+# files
+from pathlib import Path
+
+# language profiles
+from typing import NamedTuple
+
+# ################################################################ CONSTANTS
+
+# parsers available to a language, and whether they work on "lines" or on the whole "document"
+PARSERS: dict[str, str] = {
+    "generic": "lines",
+    "increasing": "lines",
+    "html": "document",
+    "latex": "lines",
+    "man": "lines",
+    "perl": "lines",
+    "restructuredtext": "document",
+}
+
+# rules used to place a new toc after the first line(s) of a file
+DIRECTIVES: tuple[str, ...] = ("generic", "frontmatter", "docstring", "magic")
+
+# ################################################################ CLASSES
+
+
+class Language(NamedTuple):
+    # how to read and write the toc of a file, selected by its extension
+    character: str = "#"
+    # multi-line comment delimiters wrapped around the toc
+    prefix: tuple[str, ...] = ()
+    suffix: tuple[str, ...] = ()
+    parser: str = "generic"
+    # character repeated to mark the level of a heading, for the "increasing" parser
+    heading: str = ""
+    directives: str = "generic"
+    # remove trailing "####" or "----" from generic headings, marking foldable sections in rstudio
+    decorations: bool = False
+
+
+# ################################################################ FUNCTIONS
+# ################################ BUILT-IN LANGUAGES
+
+_markdown = Language("//", ("<!--",), ("-->",), "increasing", "#", "frontmatter")
+_latex = Language("%", directives="magic")
+
+# every extension of a row shares the same profile
+_rows: list[tuple[str, Language]] = [
+    ("ad adoc asc asciidoc typ", Language("//", parser="increasing", heading="=")),
+    ("md", _markdown),
+    # frontmatter directives were never applied to these, changing them would move existing tocs
+    ("mdx qmd rmd", _markdown._replace(directives="generic")),
+    ("html", Language("//", ("<!--",), ("-->",), "html")),
+    ("xml", Language("//", ("<!--",), ("-->",))),
+    ("css", Language("//", ("/*",), ("*/",))),
+    (
+        "c carbon cc coffee cpp cs cu d dart go h hpp htm hxx java js jsx kt pas php pp"
+        " proto qs rs scala sc swift ts zig",
+        Language("//"),
+    ),
+    ("beancount", Language(";", parser="increasing", heading="*")),
+    ("ahk asm cl clj cljs cljc edn fasl ini lisp lsp rkt scm ss", Language(";")),
+    ("tex", _latex._replace(parser="latex")),
+    ("bib cls erl hrl mat sty", _latex),
+    ("adb ads elm hs lua sql", Language("--")),
+    # https://www.gnu.org/software/groff/manual/, https://manpages.bsd.lv/mdoc.html
+    ("1 1m 2 3 4 5 6 7 8 n", Language('.\\"', parser="man")),
+    ("apl", Language("⍝")),
+    # https://www.gavilan.edu/csis/languages/comments.html#_Toc53710123
+    ("bas bat cmd com sbl", Language("REM")),
+    # https://stackoverflow.com/a/17665688
+    ("cbl cob", Language("      *>")),
+    # https://github.com/textmate/fortran.tmbundle/issues/10#issuecomment-22660333
+    ("f90 f95 f03 f08 f15 f18", Language("!")),
+    ("f for", Language("C")),
+    ("j", Language("NB.")),
+    ("mmd mermaid", Language("%%")),
+    ("ml mli", Language("*", ("(*",), ("*)",))),
+    ("scpd scpt", Language(prefix=("(*",), suffix=("*)",))),
+    (
+        "pl pm pod",
+        Language(
+            prefix=("=encoding utf8\n=begin comment",),
+            suffix=("=end comment",),
+            parser="perl",
+        ),
+    ),
+    ("py", Language(directives="docstring")),
+    ("r rpres", Language(decorations=True)),
+    ("rst", Language("..", parser="restructuredtext")),
+    ("vb vba vbs", Language("'")),
+]
+
+BUILTIN: dict[str, Language] = {
+    _extension: _language
+    for _extensions, _language in _rows
+    for _extension in _extensions.split()
+}
+
+# jl mojo ps1 rb sh, yml, and anything else
+DEFAULT = Language()
+
+# ################################ REGISTRY
+
+
+def config_file() -> Path:
+    # follow the xdg base directory specification
+    _configHome = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(_configHome) / "toc" / "languages.json"
+
+
+def load_config(configFile: Path) -> dict[str, Language]:
+    # read user-defined languages, e.g. {"foo": {"character": "//", "prefix": ["/*"], "suffix": ["*/"]}}
+    # fields that are not set are inherited from the built-in language with the same extension
+    _languages: dict[str, Language] = {}
+    # imported here, as most users have no configuration file
+    import json
+
+    try:
+        with open(configFile, "r") as f:
+            _config = json.load(f)
+    except FileNotFoundError:
+        return _languages
+    except (OSError, ValueError) as e:
+        print(f'Could not read languages from "{configFile}": {e}', file=sys.stderr)
+        return _languages
+    try:
+        for _extension, _fields in _config.items():
+            _extension = _extension.lower().lstrip(".")
+            _fields = dict(_fields)
+            for _field in ("prefix", "suffix"):
+                if _field in _fields:
+                    # a single delimiter or a list of lines
+                    _value = _fields[_field]
+                    _fields[_field] = (
+                        (_value,) if isinstance(_value, str) else tuple(_value)
+                    )
+            _language = BUILTIN.get(_extension, DEFAULT)._replace(**_fields)
+            if _language.parser not in PARSERS:
+                raise ValueError(f'unknown parser "{_language.parser}"')
+            if _language.directives not in DIRECTIVES:
+                raise ValueError(f'unknown directives "{_language.directives}"')
+            _languages[_extension] = _language
+    except (AttributeError, TypeError, ValueError) as e:
+        print(f'Could not read languages from "{configFile}": {e}', file=sys.stderr)
+        return {}
+    return _languages
+
+
+@cache
+def registry() -> dict[str, Language]:
+    # built-in languages, overridden and extended by the user configuration
+    return BUILTIN | load_config(config_file())
+
+
+def language(extension: str) -> Language:
+    # profile of the language with this extension, defaulting to "#" comments
+    return registry().get(extension, DEFAULT)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of profiling.py                                      │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CONSTANTS
+# ├── CLASSES
+# ├── FUNCTIONS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# machine-readable report
+import json
+
+# timings
+from contextlib import contextmanager
+from time import perf_counter
+
+# phase timer
+from typing import Iterator
+
+# shared patterns
+import re
+
+# ################################################################ CONSTANTS
+
+# steps of processing a file, in order
+PHASES = ("read", "parse", "prettify", "compare", "write")
+# bytes read from disk, headings found by the parser, calls to compiled patterns
+COUNTERS = ("bytes", "headings", "regex")
+
+# ################################################################ CLASSES
+
+
+class Profile:
+    # timings of each phase and counters of a single file
+    # plain attributes, so that workers can send it back to the main process
+    def __init__(self, inputFile: str):
+        self.inputFile: str = inputFile
+        self.timings: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counters: dict[str, int] = dict.fromkeys(COUNTERS, 0)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # accumulated, as some phases run more than once per file
+        _start = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] += perf_counter() - _start
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+    def as_dict(self) -> dict:
+        return {"file": self.inputFile, **self.timings, **self.counters}
+
+
+class CountingPattern:
+    # a shared compiled pattern, counting the calls made by a single file
+    # only the methods used by the parsers are forwarded, bound in advance as they are called for every line
+    def __init__(self, pattern: re.Pattern, profile: Profile):
+        self.counters: dict[str, int] = profile.counters
+        self._match = pattern.match
+        self._search = pattern.search
+        self._finditer = pattern.finditer
+        self._sub = pattern.sub
+
+    def match(self, string, *args):
+        self.counters["regex"] += 1
+        return self._match(string, *args)
+
+    def search(self, string, *args):
+        self.counters["regex"] += 1
+        return self._search(string, *args)
+
+    def finditer(self, string, *args):
+        self.counters["regex"] += 1
+        return self._finditer(string, *args)
+
+    def sub(self, repl, string, *args, **kwargs):
+        self.counters["regex"] += 1
+        return self._sub(repl, string, *args, **kwargs)
+
+
+# ################################################################ FUNCTIONS
+
+
+def report(profiles: list[Profile], format: str = "table", rows: int = 20) -> str:
+    # summary of a run, with the slowest files first and the totals of every phase and counter
+    _profiles = sorted(profiles, key=Profile.total, reverse=True)
+    _totals = Profile("total")
+    for _profile in profiles:
+        for _name, _time in _profile.timings.items():
+            _totals.timings[_name] += _time
+        for _name, _count in _profile.counters.items():
+            _totals.counters[_name] += _count
+    if format == "json":
+        return json.dumps(
+            {
+                "files": [_profile.as_dict() for _profile in _profiles],
+                "total": _totals.as_dict(),
+            },
+            indent=2,
+        )
+    # milliseconds for phases, raw numbers for counters
+    _header = ["file", *(f"{_name} ms" for _name in (*PHASES, "total")), *COUNTERS]
+    _lines = [_header]
+    for _profile in [*_profiles[:rows], _totals]:
+        _lines.append(
+            [
+                _profile.inputFile,
+                *(f"{_time * 1000:.1f}" for _time in _profile.timings.values()),
+                f"{_profile.total() * 1000:.1f}",
+                *(str(_count) for _count in _profile.counters.values()),
+            ]
+        )
+    _widths = [max(len(_line[i]) for _line in _lines) for i in range(len(_header))]
+    _table = [
+        "  ".join(
+            # file names on the left, numbers on the right
+            _cell.ljust(_width) if i == 0 else _cell.rjust(_width)
+            for i, (_cell, _width) in enumerate(zip(_line, _widths))
+        )
+        for _line in _lines
+    ]
+    if len(_profiles) > rows:
+        _table.insert(-1, f"... {len(_profiles) - rows} faster files")
+    return "\n".join(_table)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of server.py                                         │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CONSTANTS
+# ├──┐FUNCTIONS
+# │  ├── REQUESTS
+# │  └── TRANSPORTS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# requests and responses
+import json
+
+# stdio
+import sys
+
+# unix socket
+import os
+import stat
+import socketserver
+
+# stopping on SIGTERM
+import signal
+import threading
+
+# files
+from pathlib import Path
+
+# stream types
+from typing import TextIO
+
+# toc library
+from toc.toc import Toc
+
+# ################################################################ CONSTANTS
+
+# https://www.jsonrpc.org/specification#error_object
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# methods answered by handle(), besides "shutdown"
+METHODS = ("toc", "apply", "write")
+
+# ################################################################ FUNCTIONS
+# ################################ REQUESTS
+
+
+def new_toc(params: dict) -> Toc:
+    # a toc for a path on disk, or for an editor buffer passed as "text"
+    # buffers without a path are named like stdin, using the given extension
+    if "text" in params and not isinstance(params["text"], str):
+        raise ValueError('"text" must be a string')
+    for _name in ("path", "extension", "character"):
+        if params.get(_name) is not None and not isinstance(params[_name], str):
+            raise ValueError(f'"{_name}" must be a string')
+    _depth = params.get("depth")
+    # booleans are integers in python, but not in json
+    if _depth is not None and (not isinstance(_depth, int) or isinstance(_depth, bool)):
+        raise ValueError('"depth" must be an integer')
+    _path = params.get("path") or "-"
+    if "text" in params:
+        # the buffer may differ from the file on disk, it is never read
+        t = Toc.from_string(params["text"], params.get("extension") or "", _path)
+    elif _path != "-":
+        t = Toc(Path(_path))
+        t.extension = params.get("extension") or t.extension
+        t.set_character()
+    else:
+        raise ValueError('either "path" or "text" is required')
+    t.character = params.get("character") or t.character
+    t.depth = params.get("depth") or 0
+    t.lineNumbers = bool(params.get("lineNumbers"))
+    return t
+
+
+def handle(method: str, params: dict) -> dict:
+    # run a single request, returning its result
+    match method:
+        case "toc":
+            # the toc alone, as printed by "toc file"
+            t = new_toc(params)
+            return {"toc": t.generate(), "err": t.err}
+        case "apply":
+            # the document with its toc added or updated, as written by "toc -f file"
+            t = new_toc(params)
+            _original = t._read_file()
+            _data, _err = t.apply()
+            return {"content": _data, "changed": _data != _original, "err": _err}
+        case "write":
+            # add or update the toc of a file on disk
+            if "text" in params or not params.get("path"):
+                raise ValueError('"write" requires a "path" and no "text"')
+            t = new_toc(params)
+            t.to_file()
+            return {"err": t.err}
+        case _:
+            raise ValueError(f'unknown method "{method}"')
+
+
+def respond(line: str) -> tuple[dict | None, bool]:
+    # parse a json-rpc request and build its response (None for notifications), and whether to stop serving
+    try:
+        _request = json.loads(line)
+    except ValueError as e:
+        return error(None, PARSE_ERROR, f"Parse error: {e}"), False
+    if not isinstance(_request, dict) or not isinstance(_request.get("method"), str):
+        return error(None, INVALID_REQUEST, "Invalid request"), False
+    _id = _request.get("id")
+    _method = _request["method"]
+    _params = _request.get("params") or {}
+    if _method != "shutdown" and _method not in METHODS:
+        return error(_id, METHOD_NOT_FOUND, f'Unknown method "{_method}"'), False
+    try:
+        if not isinstance(_params, dict):
+            raise ValueError("params must be an object")
+        _result = None if _method == "shutdown" else handle(_method, _params)
+    except (TypeError, ValueError) as e:
+        return error(_id, INVALID_PARAMS, f"Invalid params: {e}"), False
+    except Exception as e:
+        # a single failing request never stops the server
+        return error(_id, INTERNAL_ERROR, f"Internal error: {e!r}"), False
+    _response = {"jsonrpc": "2.0", "id": _id, "result": _result}
+    return _response if "id" in _request else None, _method == "shutdown"
+
+
+def error(id: int | str | None, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
+
+
+# ################################ TRANSPORTS
+
+
+def serve(rfile: TextIO, wfile: TextIO) -> None:
+    # answer one json request per line, until the input is closed or "shutdown" is received
+    for _line in rfile:
+        if not _line.strip():
+            continue
+        _response, _shutdown = respond(_line)
+        if _response is not None:
+            wfile.write(json.dumps(_response) + "\n")
+            wfile.flush()
+        if _shutdown:
+            break
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        # every client connection is served like stdio, "shutdown" only closes the connection
+        with (
+            self.request.makefile("r", encoding="utf-8") as rfile,
+            self.request.makefile("w", encoding="utf-8") as wfile,
+        ):
+            serve(rfile, wfile)
+
+
+def serve_socket(socketFile: Path) -> None:
+    # listen on a unix socket, serving each client in its own thread
+    # a socket left by a previous server is replaced, but never another kind of file
+    try:
+        if not stat.S_ISSOCK(os.lstat(socketFile).st_mode):
+            raise FileExistsError(f'"{socketFile}" exists and is not a socket')
+        socketFile.unlink()
+    except FileNotFoundError:
+        pass
+    # only the current user can send requests, from the moment the socket exists
+    _umask = os.umask(0o177)
+    try:
+        server = socketserver.ThreadingUnixStreamServer(str(socketFile), Handler)
+    finally:
+        os.umask(_umask)
+    # stopped by a service manager: shutdown() waits for serve_forever(), so it is called from another thread
+    _previous = None
+    if threading.current_thread() is threading.main_thread():
+        _previous = signal.signal(
+            signal.SIGTERM,
+            lambda signum, frame: threading.Thread(target=server.shutdown).start(),
+        )
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socketFile.unlink(missing_ok=True)
+            if _previous is not None:
+                signal.signal(signal.SIGTERM, _previous)
+
+
+def main(socketFile: Path | None = None) -> None:
+    # serve requests over stdio, or over a unix socket if given
+    if socketFile is None:
+        serve(sys.stdin, sys.stdout)
+        return
+    try:
+        serve_socket(socketFile)
+    except OSError as e:
+        print(f"Could not serve on {socketFile}: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -5,12 +5,15 @@
 # ├───────────────────────────────────────────────────────────────┘
 # │
 # ├── MODULES
+# ├── PATTERNS
 # ├──┐CLASSES
 # │  ├──┐PUBLIC METHODS
 # │  │  ├── COMMENT CHARACTER
 # │  │  └──┐TOC OUTPUT
 # │  │     ├── STDOUT
-# │  │     └──┐FILE
+# │  │     ├── FILE
+# │  │     ├── CHECK
+# │  │     └──┐STRING
 # │  └──┐INTERNAL METHODS
 # │     ├── TOC OUTPUT
 # │     │     ├── ADD
@@ -22,12 +25,16 @@
 # │     │  └──┐BODY
 # │     │     ├── ASCIIDOC, BEANCOUNT AND MARKDOWN
 # │     │     ├── HTML
+# │     │     ├── LATEX
 # │     │     ├── RESTRUCTUREDTEXT
 # │     │     ├── MAN PAGES
 # │     │     ├── PERL
 # │     │     ├── GENERIC
 # │     │     └── PRETTIFY CONNECTORS
-# │     └── TOC INPUT
+# │     ├── TOC INPUT
+# │     ├── RECORDS
+# │     ├── REPORTING
+# │     └── PROFILING
 # │
 # └───────────────────────────────────────────────────────────────
 
@@ -37,16 +44,188 @@
 # regex
 import re
 
+# same encoding used by open() when comparing bytes
+import locale
+import codecs
+
+# atomic writes
+import os
+import stat
+
 # stderr
 import sys
 
+# patterns compiled once per process
+from functools import cache
+
+# offsets of lines
+from itertools import accumulate
+
+# phases are only timed when profiling
+from contextlib import AbstractContextManager, nullcontext
+
 # files
 from pathlib import Path
 
+# comment character, delimiters, parser and directives of each extension
+from toc.languages import PARSERS, language
+
+# heading records and parser signatures
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    Iterator,
+    NamedTuple,
+    TextIO,
+    TypeVar,
+    cast,
+)
+
+# per-file timings and counters, importing the profiler only when needed
+if TYPE_CHECKING:
+    from toc.profiling import Profile
+
+T = TypeVar("T")
+
+# ################################################################ PATTERNS
+
+# pattern sources and flags by name, some built from the escaped comment or heading character
+# "toc" does not match the file name, so that the toc is replaced even if the file gets renamed
+_sources: dict[str, Callable[[str], tuple[str, int]]] = {
+    "toc": lambda c: (
+        rf"{c} ┌─{{63}}┐\n{c} │ Contents of (.*?){c} └─{{63}}",
+        re.DOTALL,
+    ),
+    "yaml": lambda _: (r"^---\n.*?\n---", re.DOTALL),
+    "toml": lambda _: (r"^\+\+\+\n.*?\n\+\+\+", re.DOTALL),
+    "json": lambda _: (r"^\{\n.*?\n\}", re.DOTALL),
+    "docstring": lambda _: (r'""".*?"""', re.DOTALL),
+    "directive": lambda c: (
+        rf"^#\!|(?i:<\?xml|<!doctype)|^{c}\s+([Vv]im?|ex):|^{c}\s*-\*-|^{c}^=pod$",
+        0,
+    ),
+    "increasing": lambda c: (rf"^({c}+) (?!#+)(.*)$", 0),
+    "latex": lambda _: (
+        r"\\(chapter|(?:sub){0,}section|(?:sub){0,}paragraph){(.*?)}",
+        0,
+    ),
+    "restructuredtext": lambda _: (
+        r"(?:[#\*=\-\^~]{2,}|[\"]{4,}|\n)[ \t]*(?!\.\.)(.+)\n[ \t]*([#\*=\-\^~]{2,}|[\"]{4,})\n",
+        re.MULTILINE,
+    ),
+    "man": lambda _: (r'^\.(T[Hh]|S[HhSs]) "?(\w+?(?:\s\w+?)*)"?(\s|$)', 0),
+    "perl": lambda _: (r"^=head(\d) (.*)$", 0),
+    "generic": lambda c: (
+        rf"^(?:\t| )*{c} (#{{64}}|#{{32}}|#{{16}}|#{{8}}|#{{4}}|#{{2}}) (.*)$",
+        0,
+    ),
+    # the same headings, searched in the raw bytes of a whole file
+    # starting with the comment character lets the regex engine skip quickly to candidates, indentation is checked apart
+    "generic_buffer": lambda c: (
+        rf"{c} (#{{64}}|#{{32}}|#{{16}}|#{{8}}|#{{4}}|#{{2}}) ([^\r\n]*)",
+        0,
+    ),
+    # openings of html headings, and the comments, scripts and styles skipped whole to find them
+    # an unclosed comment, script or style runs until the end, and a tag never spans another "<", so nothing is scanned twice
+    "html_headings": lambda _: (
+        r"<(?:!--[^-]*(?:-(?!->)[^-]*)*(?:-->|\Z)|(script|style)\b[^<>]*>[^<]*(?:<(?!/\1\s*>)[^<]*)*(?:</\1\s*>|\Z)|(h\d)(?![-.:\w])[^<>]*>?)",
+        re.IGNORECASE | re.DOTALL,
+    ),
+    # any tag inside an html heading
+    "html_tags": lambda _: (
+        r"<(?:!--[^-]*(?:-(?!->)[^-]*)*(?:-->|\Z)|(script|style)\b[^<>]*>[^<]*(?:<(?!/\1\s*>)[^<]*)*(?:</\1\s*>|\Z)|(/?)([a-z][-.:\w]*)[^<>]*>?)",
+        re.IGNORECASE | re.DOTALL,
+    ),
+    # lines ended by "\n", "\r\n" or "\r", like the universal newlines of open() and unlike str.splitlines()
+    "lines": lambda _: (r"[^\r\n]*(?:\r\n|\r|\n)|[^\r\n]+", 0),
+    # trailing decorations of rstudio foldable sections
+    "decorations": lambda _: (r" [#-=]{4,}", 0),
+}
+
+
+@cache
+def _pattern(name: str, character: str = "", binary: bool = False) -> re.Pattern:
+    # compile a pattern the first time it is requested, then share it with every Toc object
+    # unlike the re module cache, entries are never evicted when processing many files
+    # binary patterns match utf-8 bytes instead of text
+    _source, _flags = _sources[name](re.escape(character))
+    return re.compile(_source.encode() if binary else _source, _flags)
+
 
 # ################################################################ CLASSES
 
 
+class Heading(NamedTuple):
+    # a heading found by a parser, before being rendered in the toc
+    level: int
+    text: str
+    line: int
+
+
+class Splice(NamedTuple):
+    # the document with the characters from start to end replaced by text, without copying it
+    start: int
+    end: int
+    text: str
+
+
+# an unclosed heading ends where one of these starts or ends, instead of swallowing the rest of the page
+_blocks = frozenset(
+    "address article aside blockquote body dd details dialog div dl dt fieldset figcaption"
+    " figure footer form header hgroup hr li main nav ol p pre section table tbody td tfoot"
+    " th thead tr ul".split()
+)
+
+
+class HeadingParser:
+    # collect the text of <h0>...<h9> elements in a single pass over the page, ignoring any tag inside them
+    # outside of headings, only openings of headings, comments, scripts and styles are searched for
+    def __init__(self, headings: re.Pattern, tags: re.Pattern):
+        self.headingsRegex: re.Pattern = headings
+        self.tagsRegex: re.Pattern = tags
+        self.headings: list[Heading] = []
+
+    def parse(self, data: str) -> list[Heading]:
+        # lines are only counted up to each heading, from the previous one
+        _line, _counted = 1, 0
+        _position = 0
+        while True:
+            _match = self.headingsRegex.search(data, _position)
+            if _match is None:
+                return self.headings
+            _position = _match.end()
+            if _match.group(2) is None:
+                continue
+            _line += data.count("\n", _counted, _match.start())
+            _counted = _match.start()
+            _text: list[str] = []
+            # where the text resumes after a tag inside the heading, and where the heading ends
+            _resume, _end = _position, len(data)
+            for _tag in self.tagsRegex.finditer(data, _position):
+                _name = (_tag.group(3) or "").lower()
+                if len(_name) == 2 and _name[0] == "h" and _name[1] in "0123456789":
+                    # a new heading implicitly closes an unclosed one, and is searched for again
+                    _position = _tag.end() if _tag.group(2) else _tag.start()
+                    _end = _tag.start()
+                    break
+                if _name in _blocks:
+                    _position, _end = _tag.end(), _tag.start()
+                    break
+                _text.append(data[_resume : _tag.start()])
+                _resume = _tag.end()
+            else:
+                # a heading still open at the end of the page ends there
+                _position = _end
+            _text.append(data[_resume:_end])
+            # headings may span multiple lines
+            self.headings.append(
+                Heading(
+                    int(_match.group(2)[1]), " ".join("".join(_text).split()), _line
+                )
+            )
+
+
 class Toc:
     def __init__(self, inputFile: Path):
         self.inputFile: Path = inputFile
@@ -57,11 +236,30 @@ class Toc:
         self.character: str = "#"
         self.depth: int = 0
         self.err: str | None = None
+        self.fsync: bool = False
         self.innerTocBegin: str | None = None
         self.innerTocTitle: str | None = None
         self.innerTocEnd: str | None = None
+        # in-memory document, loaded once per run and shared by every step
+        self._data: str | None = None
+        # the same document split in lines once it is edited, so that edits never copy it
+        self._lines: list[str] | None = None
+        # headings parsed from the document, shared by every rendering of the toc
+        self._headings: list[Heading] | None = None
+        # files larger than this are scanned line by line when printing their toc
+        self.streamSize: int = 64 * 1024 * 1024
         # n=2**(7−l), l=7−math.log(n,2)
         self.levels: dict[int, int] = {64: 1, 32: 2, 16: 3, 8: 4, 4: 5, 2: 6}
+        # timings and counters of this file, only recorded if set
+        self.profile: "Profile | None" = None
+        # if quiet, messages are kept for the caller instead of being printed to stderr
+        self.quiet: bool = False
+        self.messages: list[str] = []
+        # "added" or "updated" once the toc has been written, and the size of the written file
+        self.action: str | None = None
+        self.bytesWritten: int = 0
+        # stat of the written file, to tell our own write apart from later changes
+        self.writtenStat: os.stat_result | None = None
 
     # ################################ PUBLIC METHODS
 
@@ -69,120 +267,27 @@ class Toc:
 
     def set_character(self) -> str:
         # automatically select the comment type from its extension, if not already set
-        match self.extension:
-            case (
-                "ad"
-                | "adoc"
-                | "asc"
-                | "asciidoc"
-                | "c"
-                | "carbon"
-                | "cc"
-                | "coffee"
-                | "cpp"
-                | "cs"
-                | "css"
-                | "cu"
-                | "d"
-                | "dart"
-                | "go"
-                | "h"
-                | "hpp"
-                | "htm"
-                | "html"
-                | "hxx"
-                | "java"
-                | "js"
-                | "jsx"
-                | "kt"
-                | "md"
-                | "mdx"
-                | "qmd"
-                | "rmd"
-                | "pas"
-                | "php"
-                | "pp"
-                | "proto"
-                | "qs"
-                | "rs"
-                | "scala"
-                | "sc"
-                | "swift"
-                | "ts"
-                | "typ"
-                | "xml"
-                | "zig"
-            ):
-                self.character = "//"
-            case (
-                "ahk"
-                | "asm"
-                | "beancount"
-                | "cl"
-                | "clj"
-                | "cljs"
-                | "cljc"
-                | "edn"
-                | "fasl"
-                | "ini"
-                | "lisp"
-                | "lsp"
-                | "rkt"
-                | "scm"
-                | "ss"
-            ):
-                self.character = ";"
-            case "bib" | "cls" | "erl" | "hrl" | "mat" | "sty" | "tex":
-                self.character = "%"
-            case "adb" | "ads" | "elm" | "hs" | "lua" | "sql":
-                self.character = "--"
-            # https://www.gnu.org/software/groff/manual/, https://manpages.bsd.lv/mdoc.html
-            case "1" | "1m" | "2" | "3" | "4" | "5" | "6" | "7" | "8" | "n":
-                self.character = '.\\"'
-            case "apl":
-                self.character = "⍝"
-            # https://www.gavilan.edu/csis/languages/comments.html#_Toc53710123
-            case "bas" | "bat" | "cmd" | "com" | "sbl":
-                self.character = "REM"
-            # https://stackoverflow.com/a/17665688
-            case "cbl" | "cob":
-                self.character = "      *>"
-            # https://github.com/textmate/fortran.tmbundle/issues/10#issuecomment-22660333
-            case "f90" | "f95" | "f03" | "f08" | "f15" | "f18":
-                self.character = "!"
-            case "f" | "for":
-                self.character = "C"
-            case "j":
-                self.character = "NB."
-            case "mmd" | "mermaid":
-                self.character = "%%"
-            case "ml" | "mli":
-                self.character = "*"
-            case "rst":
-                self.character = ".."
-            case "vb" | "vba" | "vbs":
-                self.character = "'"
-            # jl mojo pl pm ps1 py r rb sh, yml, and anything else
-            case _:
-                self.character = "#"
+        self.character = language(self.extension).character
         return self.character
 
     # ################ TOC OUTPUT
     # ######## STDOUT
 
     def to_stdout(self) -> None:
+        # the document is not needed to print the toc, large files can be scanned line by line
+        self._stream_headings()
         _, _outerToc = self._generate_toc()
         if _outerToc == "":
             # skip error if we already set self.err
             (
-                print(
-                    f'Could not generate a "{self.character}" toc from "{self.inputFile}"',
-                    file=sys.stderr,
+                self._log(
+                    f'Could not generate a "{self.character}" toc from "{self.inputFile}"'
                 )
                 if self.err is None
                 else None
             )
-            self.err = "empty"
+            # keep the reason why the file could not be read
+            self.err = self.err or "empty"
         else:
             print(_outerToc)
 
@@ -193,66 +298,239 @@ class Toc:
         if self.outputFile is None:
             self.outputFile = output if output else self.inputFile
         if self.inputFile == Path("-"):
+            (self._log("Cannot write to stdin") if self.err is None else None)
+            self.err = "stdin"
+        else:
+            self._add_or_update()
+
+    # ######## CHECK
+
+    def check(self) -> bool:
+        # return true if to_file would add or update the toc, without ever opening the file for writing
+        _splice, _ = self._splice()
+        if _splice is None:
             (
-                print("Cannot write to stdin", file=sys.stderr)
+                self._log(
+                    f'Could not generate a "{self.character}" toc from "{self.inputFile}"'
+                )
                 if self.err is None
                 else None
             )
-            self.err = "stdin"
-        else:
-            # run twice because updating the toc with self.lineNumbers == True may shift everything down
-            n = 2 if self.lineNumbers else 1
-            for _ in range(n):
-                self._add_or_update()
+            # keep the reason why the file could not be read
+            self.err = self.err or "empty"
+            return False
+        with self._phase("compare"):
+            _same = self._unchanged(_splice)
+        if _same:
+            self.err = "same"
+            return False
+        self._log(f'Outdated toc in "{self.inputFile}"')
+        self.err = "outdated"
+        return True
+
+    # ######## STRING
+
+    @classmethod
+    def from_string(
+        cls, text: str, extension: str = "", path: Path | str = "-"
+    ) -> "Toc":
+        # a toc for a document already in memory, that is never read from disk or stdin
+        # the path is only used for the name in the toc header and, without an extension, to select the language
+        t = cls(Path(path))
+        t.extension = extension.lower().lstrip(".") or t.extension
+        t.set_character()
+        t._data = text
+        return t
+
+    def generate(self) -> str:
+        # return the toc of the document, or "" if it has no headings
+        _, _outerToc = self._generate_toc()
+        if _outerToc == "" and self.err is None:
+            self.err = "empty"
+        return _outerToc
+
+    def records(self) -> list[dict]:
+        # return the parsed headings with the offset in bytes of the line they start on, without rendering a toc
+        _headings = [
+            _heading
+            for _heading in self._toc_headings()
+            if self.depth == 0 or _heading.level <= self.depth
+        ]
+        if not _headings and self.err is None:
+            self.err = "empty"
+        _offsets = self._line_offsets(sorted({_heading.line for _heading in _headings}))
+        return [
+            {
+                "file": str(self.inputFile),
+                "level": _heading.level,
+                "text": _heading.text,
+                "line": _heading.line,
+                "offset": _offsets[_heading.line],
+            }
+            for _heading in _headings
+        ]
+
+    def edit(self, line: int, count: int, text: str) -> None:
+        # replace "count" lines of the document starting at "line" (from 1) with the lines of "text"
+        # parsers working on lines only parse the new lines, headings below are moved by the difference
+        # other parsers parse the whole document again the next time the toc is rendered
+        if self._lines is None:
+            self._lines = self._split_lines(self._read_file(), True)
+        if line < 1 or count < 0 or line + count - 1 > len(self._lines):
+            raise ValueError(
+                f"lines {line} to {line + count - 1} are not in the document of {len(self._lines)} lines"
+            )
+        # the new lines are whole lines, even if the text or the document do not end with a newline
+        _newLines = self._split_lines(text, True)
+        if _newLines and line + count - 1 < len(self._lines):
+            _newLines[-1] += "" if self._has_newline(_newLines[-1]) else "\n"
+        if _newLines and line > len(self._lines) and self._lines:
+            self._lines[-1] += "" if self._has_newline(self._lines[-1]) else "\n"
+        self._lines[line - 1 : line - 1 + count] = _newLines
+        self._data = None
+        _parser, _input = self._toc_parser()
+        if self._headings is None or _input != "lines":
+            self._headings = None
+            return
+        with self._phase("parse"):
+            _parsed = _parser(self._split_lines("".join(_newLines)))
+        self._count("headings", len(_parsed))
+        # imported here, as most runs never edit a document
+        from bisect import bisect_left
+
+        # headings are sorted by line, only those after the edit are moved
+        _start = bisect_left(self._headings, line, key=lambda _heading: _heading.line)
+        _end = bisect_left(
+            self._headings, line + count, key=lambda _heading: _heading.line
+        )
+        _shift = len(_newLines) - count
+        self._headings[_start:_end] = [
+            Heading(_heading.level, _heading.text, _heading.line + line - 1)
+            for _heading in _parsed
+        ]
+        if _shift:
+            for i in range(_start + len(_parsed), len(self._headings)):
+                _heading = self._headings[i]
+                self._headings[i] = Heading(
+                    _heading.level, _heading.text, _heading.line + _shift
+                )
+
+    def apply(self, text: str | None = None) -> tuple[str, str | None]:
+        # return the text with its toc added or updated, or unchanged if it has no headings, and the error if any
+        # the document is replaced on a copy, so that a single object can be shared by many threads
+        # imported here, as most runs never apply a toc to a string
+        import copy
+
+        _toc = copy.copy(self)
+        # nothing of the copy is shared, besides the options and the immutable document
+        _toc.messages = []
+        if self.profile is not None:
+            from toc.profiling import Profile
+
+            _toc.profile = Profile(self.profile.inputFile)
+        if text is not None:
+            _toc._invalidate(text)
+        _data, _ = _toc._compose()
+        if _data == "":
+            _toc.err = _toc.err or "empty"
+            return _toc._read_file(), _toc.err
+        return _data, _toc.err
 
     # ################################ INTERNAL METHODS
     # ################ TOC OUTPUT
 
     def _add_or_update(self) -> None:
-        _innerToc, _outerToc = self._generate_toc()
+        _splice, _existing = self._splice()
         # do not write an empty file
-        if _outerToc == "":
+        if _splice is None:
             (
-                print(
-                    f'Could not generate a "{self.character}" toc from "{self.inputFile}"',
-                    file=sys.stderr,
+                self._log(
+                    f'Could not generate a "{self.character}" toc from "{self.inputFile}"'
                 )
                 if self.err is None
                 else None
             )
-            self.err = "empty"
+            # keep the reason why the file could not be read
+            self.err = self.err or "empty"
+        elif _existing:
+            self._update_toc(_splice)
         else:
-            # if the file does not contain a toc, add it, otherwise update it
-            # re.MULTILINE: https://docs.python.org/3/library/re.html#re.M
-            # match also file name, results in a second toc if file is renamed
-            # self.pattern = re.compile(
-            #    rf"{self.innerTocBegin}\n{self.innerTocTitle}(.*?){self.innerTocEnd}",
-            #    re.DOTALL,
-            # )
-            # does not match file name, replacing toc even if file gets renamed
-            self.pattern = re.compile(
-                rf"{self.innerTocBegin}\n{self.character} │ Contents of (.*?){self.innerTocEnd}",
-                re.DOTALL,
-            )
-            # print(self.pattern)
-            _data = self._read_file()
-            # print(_data)
-            if re.search(self.pattern, _data):
-                self._update_toc(_innerToc)
-            else:
-                self._add_toc(_outerToc)
+            self._add_toc(_splice)
+
+    def _compose(self) -> tuple[str, bool]:
+        # return the document with its toc, and whether an existing toc was updated, without writing anything
+        _splice, _existing = self._splice()
+        if _splice is None:
+            return "", False
+        _data = self._read_file()
+        return _data[: _splice.start] + _splice.text + _data[_splice.end :], _existing
+
+    def _splice(self) -> tuple[Splice | None, bool]:
+        # return where the toc goes in the document, and whether an existing toc is updated
+        # adding or updating the toc may shift the headings below it, so line numbers are offset in advance
+        _after, _shift = self._line_shift() if self.lineNumbers else (0, 0)
+        _innerToc, _outerToc = self._generate_toc(_after, _shift)
+        if _outerToc == "":
+            return None, False
+        # if the file does not contain a toc, add it, otherwise update it
+        # re.MULTILINE: https://docs.python.org/3/library/re.html#re.M
+        # match also file name, results in a second toc if file is renamed
+        # self.pattern = re.compile(
+        #    rf"{self.innerTocBegin}\n{self.innerTocTitle}(.*?){self.innerTocEnd}",
+        #    re.DOTALL,
+        # )
+        self.pattern = self._toc_pattern()
+        _match = self.pattern.search(self._read_file())
+        if _match:
+            return self._replace_existing_toc(_match, _innerToc), True
+        return self._check_directives(_outerToc), False
 
-    def _write_toc(self, data: str) -> None:
+    def _toc_pattern(self) -> re.Pattern:
+        # does not match file name, replacing toc even if file gets renamed
+        return self._regex("toc", self.character)
+
+    def _line_shift(self) -> tuple[int, int]:
+        # return the last line not moved by the new toc, and by how many lines the following ones move
+        _innerHeight, _outerHeight = self._toc_height()
+        _data = self._read_file()
+        _match = self._toc_pattern().search(_data)
+        if _match:
+            # updating replaces the existing inner toc, moving the lines below it by the height difference
+            _begin = _data.count("\n", 0, _match.start()) + 1
+            _end = _data.count("\n", 0, _match.end()) + 1
+            return _end, _innerHeight - (_end - _begin + 1)
+        _end, _after = self._toc_position()
+        if _after:
+            # the toc and a blank line are inserted after the directives
+            return _data.count("\n", 0, _end) + 1, _outerHeight + 1
+        elif _end == 0:
+            # the toc is prepended to the existing empty line
+            return 0, _outerHeight
+        else:
+            # the toc and a blank line are prepended to the file
+            return 0, _outerHeight + 1
+
+    def _write_toc(self, splice: Splice) -> None:
         # common function to rewrite file
-        if data and self.outputFile is not None:
+        if splice.text and self.outputFile is not None:
             try:
-                with open(self.outputFile, "w") as f:
-                    f.write(data)
+                # if the output already has this content, it makes no sense to rewrite the file
+                with self._phase("compare"):
+                    _same = self._same_content(splice)
+                if _same:
+                    self.err = "same"
+                    if not self.updated:
+                        self._log(f'Skipping unchanged toc in "{self.outputFile}"')
+                        self.updated = True
+                    return
+                with self._phase("write"):
+                    self._replace_file(splice)
+                # the input file has been overwritten, the document is loaded again if ever needed
+                if self.outputFile == self.inputFile:
+                    self._invalidate()
             except PermissionError:
                 (
-                    print(
-                        f'Skipping write-protected "{self.outputFile}"', file=sys.stderr
-                    )
+                    self._log(f'Skipping write-protected "{self.outputFile}"')
                     if self.err is None
                     else None
                 )
@@ -260,10 +538,7 @@ class Toc:
                 self.updated = True
             except BaseException:
                 (
-                    print(
-                        f'Unknown error while writing "{self.outputFile}"',
-                        file=sys.stderr,
-                    )
+                    self._log(f'Unknown error while writing "{self.outputFile}"')
                     if self.err is None
                     else None
                 )
@@ -271,55 +546,156 @@ class Toc:
                 self.updated = True
         elif not self.updated:
             # data should never be empty if self.updated = False, but in case least we prevented cleaning the file
-            print(f'Skipping writing "{self.outputFile}"', file=sys.stderr)
+            self._log(f'Skipping writing "{self.outputFile}"')
             self.updated = True
         # elif self.updated: we skipped replacing the same toc
 
+    def _same_content(self, splice: Splice) -> bool:
+        # compare the new content with the input document already in memory, or with the hash of the output file
+        if self.outputFile is None:
+            return False
+        if self.outputFile == self.inputFile and self._data is not None:
+            return self._unchanged(splice)
+        # imported here, as most runs never hash their output
+        import hashlib
+
+        _encoding = locale.getpreferredencoding(False)
+        try:
+            _size = os.stat(self.outputFile).st_size
+        except OSError:
+            return False
+        _new = hashlib.blake2b(digest_size=16)
+        _length = 0
+        for _chunk in self._chunks(splice):
+            _encoded = _chunk.encode(_encoding)
+            _length += len(_encoded)
+            if _length > _size:
+                return False
+            _new.update(_encoded)
+        if _length != _size:
+            return False
+        _old = hashlib.blake2b(digest_size=16)
+        try:
+            with open(self.outputFile, "rb") as f:
+                while _block := f.read(1 << 20):
+                    _old.update(_block)
+        except OSError:
+            return False
+        return _old.digest() == _new.digest()
+
+    def _unchanged(self, splice: Splice) -> bool:
+        # only the spliced characters may differ from the document
+        return self._read_file()[splice.start : splice.end] == splice.text
+
+    def _chunks(self, splice: Splice) -> Iterator[str]:
+        # the document with the toc spliced in, in pieces of bounded size
+        # large documents are streamed to the output instead of being copied as a whole
+        _data = self._read_file()
+        _size = 1 << 20
+        for i in range(0, splice.start, _size):
+            yield _data[i : min(i + _size, splice.start)]
+        yield splice.text
+        for i in range(splice.end, len(_data), _size):
+            yield _data[i : i + _size]
+
+    def _replace_file(self, splice: Splice) -> None:
+        # write to a temporary file next to the output, then rename it over the output
+        # an interruption leaves either the old or the new content, never a truncated file
+        if self.outputFile is None:
+            return
+        # replace the target of a symlink, not the symlink itself
+        _target = Path(os.path.realpath(self.outputFile))
+        _mode = None
+        if _target.exists():
+            # os.replace() would happily replace a read-only file
+            if not os.access(_target, os.W_OK):
+                raise PermissionError(_target)
+            _mode = stat.S_IMODE(os.stat(_target).st_mode)
+        _tmpFile = _target.with_name(f".{_target.name}.{os.getpid()}.{id(self)}.tmp")
+        try:
+            f = open(_tmpFile, "x")
+        except PermissionError:
+            # the directory is not writable but the file may be, fall back to writing in place
+            with open(_target, "w") as f:
+                f.writelines(self._chunks(splice))
+                f.flush()
+                self.writtenStat = os.fstat(f.fileno())
+                self.bytesWritten = self.writtenStat.st_size
+            return
+        try:
+            with f:
+                f.writelines(self._chunks(splice))
+                f.flush()
+                self.writtenStat = os.fstat(f.fileno())
+                self.bytesWritten = self.writtenStat.st_size
+                if self.fsync:
+                    os.fsync(f.fileno())
+            if _mode is not None:
+                os.chmod(_tmpFile, _mode)
+            os.replace(_tmpFile, _target)
+        except BaseException:
+            _tmpFile.unlink(missing_ok=True)
+            raise
+        if self.fsync:
+            # persist the rename as well
+            try:
+                _fd = os.open(_target.parent, os.O_RDONLY)
+                try:
+                    os.fsync(_fd)
+                finally:
+                    os.close(_fd)
+            except OSError:
+                # directories cannot be opened on every platform
+                pass
+
     # #### ADD
 
-    def _add_toc(self, outerToc: str) -> None:
-        # check for begin-of-file directives and write output
-        _data = self._check_directives(outerToc)
-        self._write_toc(_data)
+    def _add_toc(self, splice: Splice) -> None:
+        # write the document with the toc placed after begin-of-file directives
+        self._write_toc(splice)
         if not self.updated:
-            print(f'Adding toc to "{self.outputFile}"', file=sys.stderr)
+            self._log(f'Adding toc to "{self.outputFile}"')
+            self.action = "added"
             self.updated = True
 
-    def _check_directives(self, outerToc: str) -> str:
+    def _check_directives(self, outerToc: str) -> Splice:
         # if a frontmatter, shebang or directive is found, append after first line(s)
-        _data = self._read_file()
-        _lines = _data.splitlines()
-        _firstLine = _lines[0]
-        if _firstLine == "":
-            # if _firstLine was be empty, re.sub would destroy the original file by inserting an outerToc between every character
-            _data = outerToc + "\n" + _data
+        # the first line(s) always start the document, so the toc is inserted at their end or at the very beginning
+        _end, _after = self._toc_position()
+        if _after:
+            return Splice(_end, _end, "\n\n" + outerToc)
+        elif _end == 0:
+            # the first line is empty, the toc takes its place
+            return Splice(0, 0, outerToc + "\n")
         else:
-            match self.extension:
-                case "md":
+            return Splice(0, 0, outerToc + "\n\n")
+
+    def _toc_position(self) -> tuple[int, bool]:
+        # return where the first line(s) of the file end, and whether the toc should be placed after them
+        _data = self._read_file()
+        # only the first line is split, not the whole document
+        _newline = _data.find("\n")
+        _lines = (_data if _newline == -1 else _data[:_newline]).splitlines()
+        _firstLine = _lines[0] if _lines else ""
+        _after = False
+        if _firstLine != "":
+            match language(self.extension).directives:
+                case "frontmatter":
                     # multi line yaml, toml, js frontmatter for markdown
-                    _firstline_yaml = re.search(r"^---$", _firstLine)
-                    _firstline_toml = re.search(r"^\+\+\+$", _firstLine)
-                    _firstline_json = re.search(r"^{$", _firstLine)
-                    if _firstline_yaml is not None:
-                        _frontmatters_yaml = re.search(
-                            r"^---\n.*?\n---", _data, re.DOTALL
-                        )
+                    if _firstLine == "---":
+                        _frontmatters_yaml = self._regex("yaml").match(_data)
                         if _frontmatters_yaml is not None:
                             _frontmatter = _frontmatters_yaml.group(0)
                         else:
                             _frontmatter = None
-                    elif _firstline_toml is not None:
-                        _frontmatters_toml = re.search(
-                            r"^\+\+\+\n.*?\n\+\+\+", _data, re.DOTALL
-                        )
+                    elif _firstLine == "+++":
+                        _frontmatters_toml = self._regex("toml").match(_data)
                         if _frontmatters_toml is not None:
                             _frontmatter = _frontmatters_toml.group(0)
                         else:
                             _frontmatter = None
-                    elif _firstline_json is not None:
-                        _frontmatters_json = re.search(
-                            r"^\{\n.*?\n\}", _data, re.DOTALL
-                        )
+                    elif _firstLine == "{":
+                        _frontmatters_json = self._regex("json").match(_data)
                         if _frontmatters_json is not None:
                             _frontmatter = _frontmatters_json.group(0)
                         else:
@@ -328,104 +704,72 @@ class Toc:
                         _frontmatter = None
                     if _frontmatter is not None:
                         _firstLine = _frontmatter
-                        _firstFewLines = _firstLine + "\n\n" + outerToc
+                        _after = True
                     else:
-                        _firstFewLines = outerToc + "\n\n" + _firstLine
+                        _after = False
                     # print(_frontmatter)
-                    # print(_firstFewLines)
-                case "py":
+                case "docstring":
                     # need to match shebang also here since we have a switch/case by extension
-                    _firstline_shebang = re.search(r"^#\!", _firstLine)
-                    # module docstring for python
-                    _firstline_docstring = re.search(r'"""', _firstLine)
-                    if _firstline_shebang is not None:
-                        _firstFewLines = _firstLine + "\n\n" + outerToc
+                    if _firstLine.startswith("#!"):
+                        _after = True
                     else:
-                        if _firstline_docstring is not None:
-                            _docstrings = re.search(r'""".*?"""', _data, re.DOTALL)
+                        # module docstring for python
+                        if '"""' in _firstLine:
+                            _docstrings = self._regex("docstring").search(_data)
                             if _docstrings is not None:
-                                _docstring = _docstrings.group(0)
-                                _firstLine = _docstring
-                                _firstFewLines = _firstLine + "\n\n" + outerToc
+                                # the docstring may not start the line, keep what comes before it
+                                _firstLine = _data[: _docstrings.end()]
+                                _after = True
                             else:
-                                _firstFewLines = outerToc + "\n\n" + _firstLine
+                                _after = False
                         else:
-                            _firstFewLines = outerToc + "\n\n" + _firstLine
-                case "bib" | "cls" | "erl" | "hrl" | "mat" | "sty" | "tex":
-                    _firstline_magic_comment = re.search(r"^% \!", _firstLine)
-                    if _firstline_magic_comment is not None:
-                        _magic_comment_lines = []
-                        for _current_line in _data.splitlines():
-                            if _current_line.startswith("% !"):
-                                _magic_comment_lines.append(_current_line)
-                            else:
+                            _after = False
+                case "magic":
+                    if _firstLine.startswith("% !"):
+                        # only the leading magic comments are scanned, not every line of the document
+                        _end = 0
+                        for _line in _pattern("lines").finditer(_data):
+                            if not _line.group().startswith("% !"):
                                 break
-                        _firstLine = "\n".join(_magic_comment_lines)
-                        _firstFewLines = _firstLine + "\n\n" + outerToc
+                            _end = _line.start() + len(_line.group().rstrip("\r\n"))
+                        _firstLine = _data[:_end]
+                        _after = True
                     else:
-                        _firstFewLines = outerToc + "\n\n" + _firstLine
+                        _after = False
                 case _:
                     # single line shebang, xml, html, vim, emacs, perl pod
-                    if (
-                        re.search(r"^#\!", _firstLine)
-                        or re.search(r"<\?xml", _firstLine, re.IGNORECASE)
-                        or re.search(r"<!doctype", _firstLine, re.IGNORECASE)
-                        or re.search(
-                            r"^" + re.escape(self.character) + r"\s+([Vv]im?|ex):",
-                            _firstLine,
-                        )
-                        or re.search(
-                            r"^" + re.escape(self.character) + r"\s*-\*-", _firstLine
-                        )
-                        or re.search(
-                            r"^" + re.escape(self.character) + r"^=pod$", _firstLine
-                        )
-                    ):
+                    if self._regex("directive", self.character).search(_firstLine):
                         # print("adding toc after shebang")
-                        _firstFewLines = _firstLine + "\n\n" + outerToc
+                        _after = True
                     # else prepend as first line and put everything else after
                     else:
                         # print("adding toc before content")
-                        _firstFewLines = outerToc + "\n\n" + _firstLine
-            _data = re.sub(re.escape(_firstLine), _firstFewLines, _data, count=1)
-        return _data
+                        _after = False
+        return len(_firstLine), _after
 
     # #### UPDATE
 
-    def _update_toc(self, innerToc: str) -> None:
-        # replace existing toc and write output
-        _data = self._replace_existing_toc(innerToc)
-        self._write_toc(_data)
+    def _update_toc(self, splice: Splice) -> None:
+        # write the document with the existing toc replaced
+        self._write_toc(splice)
         if not self.updated:
-            print(f'Updating toc in "{self.outputFile}"', file=sys.stderr)
+            self._log(f'Updating toc in "{self.outputFile}"')
+            self.action = "updated"
             self.updated = True
 
-    def _replace_existing_toc(self, innerToc: str) -> str:
+    def _replace_existing_toc(self, match: re.Match, innerToc: str) -> Splice:
         # replace over multiple lines between two patterns
-        _data = self._read_file()
-        # if the new toc is already present in the file, it makes no sense to rewrite the file
-        # re.escape to treat dots and other characters literally
-        if self.outputFile == self.inputFile and re.search(
-            re.escape(innerToc), _data, re.MULTILINE
-        ):
-            self.err = "same"
-            _data = ""
-            if not self.updated:
-                print(f'Skipping unchanged toc in "{self.outputFile}"', file=sys.stderr)
-                self.updated = True
-        else:
-            # use non-greedy regex to only replace the smalles portion of text between innerTocBegin and innerTocEnd
-            # use count to only replace the first valid region in file
-            _data = re.sub(self.pattern, innerToc, _data, count=1)
-        return _data
+        # an unchanged toc is detected before writing, by comparing the replaced region only
+        # the non-greedy regex matched the smallest portion of text between innerTocBegin and innerTocEnd, in the first valid region
+        return Splice(match.start(), match.end(), innerToc)
 
     # ################ TOC GENERATION
 
-    def _generate_toc(self) -> tuple[str, str]:
+    def _generate_toc(self, after: int = 0, shift: int = 0) -> tuple[str, str]:
         # run text processors and convert lists to strings
         _tocPrefix, _tocSuffix = self._toc_prefix_suffix()
         _tocHeader = self._toc_header()
-        _tocBody = self._toc_body()
+        _tocBody = self._toc_body(after, shift)
         _tocFooter = self._toc_footer()
         # exclude empty body
         if _tocBody:
@@ -441,26 +785,28 @@ class Toc:
         else:
             return "", ""
 
+    def _toc_height(self) -> tuple[int, int]:
+        # count the lines of the inner and outer toc without rendering them
+        _tocPrefix, _tocSuffix = self._toc_prefix_suffix()
+        _bodyHeight = sum(
+            1
+            for _heading in self._toc_headings()
+            if self.depth == 0 or _heading.level <= self.depth
+        )
+        _innerHeight = len(self._toc_header()) + _bodyHeight + len(self._toc_footer())
+        # some prefixes span multiple lines
+        _outerHeight = _innerHeight + sum(
+            _line.count("\n") + 1 for _line in _tocPrefix + _tocSuffix
+        )
+        return _innerHeight, _outerHeight
+
     # ######## PREFIX AND SUFFIX
 
     def _toc_prefix_suffix(self) -> tuple[list, list]:
         # print a multi-line comment delimiter if needed
-        match self.extension:
-            case "css":
-                _tocPrefix = ["/*"]
-                _tocSuffix = ["*/"]
-            case "html" | "xml" | "md" | "mdx" | "qmd" | "rmd":
-                _tocPrefix = ["<!--"]
-                _tocSuffix = ["-->"]
-            case "ml" | "mli" | "scpd" | "scpt":
-                _tocPrefix = ["(*"]
-                _tocSuffix = ["*)"]
-            case "pl" | "pm" | "pod":
-                _tocPrefix = ["=encoding utf8\n=begin comment"]
-                _tocSuffix = ["=end comment"]
-            case _:
-                _tocPrefix = []
-                _tocSuffix = []
+        _language = language(self.extension)
+        _tocPrefix = list(_language.prefix)
+        _tocSuffix = list(_language.suffix)
         return _tocPrefix, _tocSuffix
 
     # ######## HEADER
@@ -507,115 +853,109 @@ class Toc:
 
     # ######## BODY
 
-    def _toc_body(self) -> list:
-        # read file content and process it accordingly
+    def _toc_body(self, after: int = 0, shift: int = 0) -> list:
+        # render the parsed headings, moving the line numbers of those below "after" by "shift"
+        _newtoc = []
+        for _heading in self._toc_headings():
+            # limit output to a max level
+            if self.depth != 0 and _heading.level > self.depth:
+                continue
+            if self.lineNumbers:
+                _line = (
+                    _heading.line + shift if _heading.line > after else _heading.line
+                )
+                _heading = _heading._replace(text=f"{_heading.text} {_line}")
+            _newtoc.append(_heading)
+        with self._phase("prettify"):
+            _tocBody = self._prettify_connectors(_newtoc)
+        return _tocBody
+
+    def _toc_headings(self) -> list[Heading]:
+        # read file content and process it accordingly, only once per document
         # display alert for common errors
+        if self._headings is not None:
+            return self._headings
+        _parser, _input = self._toc_parser()
         _data = self._read_file()
-        _lines = _data.splitlines()
-        match self.extension:
-            case "ad" | "adoc" | "asc" | "asciidoc" | "typ":
-                _newtoc = self._process_increasing(_lines, "=")
-            case "beancount":
-                _newtoc = self._process_increasing(_lines, "*")
-            case "md" | "mdx" | "qmd" | "rmd":
-                _newtoc = self._process_increasing(_lines, "#")
-            case "html":
-                _newtoc = self._process_html(_data)
-            case "tex":
-                _newtoc = self._process_latex(_lines)
-            case "1" | "1m" | "2" | "3" | "4" | "5" | "6" | "7" | "8" | "n":
-                _newtoc = self._process_man(_lines)
-            case "pl" | "pm" | "pod":
-                _newtoc = self._process_perl(_lines)
-            case "rst":
-                _newtoc = self._process_restructuredtext(_data)
-            case _:
-                _newtoc = self._process_generic(_lines)
-        _tocBody = self._prettify_connectors(_newtoc)
-        return _tocBody
+        with self._phase("parse"):
+            self._headings = _parser(
+                self._split_lines(_data) if _input == "lines" else _data
+            )
+        self._count("headings", len(self._headings))
+        return self._headings
 
-    def _add_heading(self, level: int, text: str) -> str:
-        # limit output to a max level
-        if self.depth != 0 and level > self.depth:
-            _replacement = ""
-        else:
-            if level == 1:
-                _replacement = self.character + " ├── " + text
-            else:
-                # character, left toc margin, indentation of 3 spaces per heading level, connectors, text
-                _replacement = (
-                    self.character + " │  " + "   " * (level - 2) + "└── " + text
-                )
-            # print(_replacement)
-        return _replacement
+    def _stream_headings(self) -> None:
+        # iterate over the lines of a large file, only keeping the matched headings in memory
+        _parser, _input = self._toc_parser()
+        if (
+            _input == "document"
+            or self._headings is not None
+            or self._data is not None
+            or self._lines is not None
+            or self.inputFile == Path("-")
+        ):
+            return
+        try:
+            if self.inputFile.stat().st_size < self.streamSize:
+                return
+        except OSError:
+            # errors are reported when the file is read normally
+            return
+        # generic comments can be found in the raw bytes, as long as open() would decode them as utf-8
+        if (
+            language(self.extension).parser == "generic"
+            and codecs.lookup(locale.getpreferredencoding(False)).name == "utf-8"
+        ):
+            _parser = self._scan_generic
+        # reading is part of parsing, as the file is never loaded as a whole
+        with self._phase("parse"):
+            self._headings = self._read_input(_parser, [])
+        self._count("headings", len(self._headings))
+
+    def _toc_parser(self) -> tuple[Callable, str]:
+        # return the parser for the current extension, and whether it works on "lines" or on the whole "document"
+        # parsers working on lines can be passed a file object instead
+        _language = language(self.extension)
+        if _language.parser == "increasing":
+            return (
+                lambda lines: self._process_increasing(lines, _language.heading),
+                "lines",
+            )
+        return getattr(self, f"_process_{_language.parser}"), PARSERS[_language.parser]
 
     # #### ASCIIDOC, BEANCOUNT AND MARKDOWN
 
-    def _process_increasing(self, lines: list, heading_character: str) -> list:
+    def _process_increasing(
+        self, lines: Iterable[str], heading_character: str
+    ) -> list[Heading]:
         # parse markdown and beancount files, reusing headings or sections
         _newtoc = []
         # ignore comments for other languages
         # don't consider valid comments in code blocks as headings: "```\n# #### Example comment in python\n```"
-        _pattern = re.compile(r"^(" + re.escape(heading_character) + "+) (?!#+)(.*)$")
+        _regex = self._regex("increasing", heading_character)
         for n, line in enumerate(lines):
-            _match = _pattern.match(line)
+            _match = _regex.match(line)
             if _match:
                 _heading_level = len(_match.group(1))
-                _heading_text = (
-                    f"{_match.group(2)} {n+1}" if self.lineNumbers else _match.group(2)
-                )
-                _newtoc.append(self._add_heading(_heading_level, _heading_text))
+                _newtoc.append(Heading(_heading_level, _match.group(2), n + 1))
                 # print(_newtoc)
         return _newtoc
 
     # #### HTML
-    def _process_html(self, data: str) -> list:
-        _newtoc = []
+
+    def _process_html(self, data: str) -> list[Heading]:
         # every time an html page is parsed with regex, a software engineer dies
-        # _pattern = re.compile(r"<h(\d).*?>(?:<.*?>)?(.*?)</.*?h\d", re.MULTILINE)
-        # https://learnbyexample.github.io/python-regex-possessive-quantifier/
-        # _pattern = re.compile(r"<h(\d)(?>.*?)>?(?:\s)*(?:<.*?>)?(?:\s)*(.*?)(?:\s)*</(.*?)h\d>", re.MULTILINE)
-        # _pattern = re.compile(r"<h(\d).*?>.*?>?(?:\s)*(?:<.*?>)?(?:\s)*(.*?)(?:\s)*</.*?h\d>", re.DOTALL)
-        _pattern = re.compile(
-            r"<[hH](\d).*?>.*?>?(?:\s)*(?:<.*?>)?(?:\s)*(.*?)(?:\s)*</[hH]\d>",
-            re.DOTALL,
-        )
-        # _matches = _pattern.finditer(data)
-        # print(sum(1 for _ in _matches))
-        # for _match in _matches:
-        # sometimes it fails if not using list()
-        # _matches = list(_pattern.finditer(data))
-        # print(len(_matches))
-        # print(_matches)
-        # used to calculare line numbers without starting from the beginning every time
-        _fromLastMatch = 0
-        n = 1
-        for _match in _pattern.finditer(data):
-            # indicates character, not line number
-            _heading_level = int(_match.group(1))
-            # in case there are fancy tags or other elements inside the title, we remove them
-            # blood for the blood god
-            _heading_text = re.sub(r"<.*?>", "", _match.group(2)).strip()
-            # print(f"Heading text: '{_heading_text}'")
-            if self.lineNumbers:
-                # return the character number, not the line number
-                _untilCurrentMatch = _match.start(0)
-                # to calculate the line number, let's count the number of "\n" up to the match start, and add 1 to the result
-                n += data.count("\n", _fromLastMatch, _untilCurrentMatch)
-                _heading_text = _heading_text + " " + str(n)
-                # update with the position of the current match
-                _fromLastMatch = _untilCurrentMatch
-            _newtoc.append(self._add_heading(_heading_level, _heading_text))
-        return _newtoc
+        # tags are only found by a regex, and never matched to each other, so the page is scanned once in linear time
+        return HeadingParser(
+            self._regex("html_headings"), self._regex("html_tags")
+        ).parse(data)
 
     # #### LATEX
 
-    def _process_latex(self, lines: list) -> list:
+    def _process_latex(self, lines: Iterable[str]) -> list[Heading]:
         # parse latexc, reusing headings
         _newtoc = []
-        _pattern = re.compile(
-            r"\\(chapter|(?:sub){0,}section|(?:sub){0,}paragraph){(.*?)}"
-        )
+        _regex = self._regex("latex")
         _levels = {
             "chapter": 1,
             "section": 2,
@@ -625,228 +965,317 @@ class Toc:
             "subparagraph": 6,
         }
         for n, line in enumerate(lines):
-            _match = _pattern.match(line)
+            _match = _regex.match(line)
             if _match:
                 _heading_level = _levels.get(_match.group(1), 1)
-                _heading_text = (
-                    f"{_match.group(2)} {n+1}" if self.lineNumbers else _match.group(2)
-                )
-                _newtoc.append(self._add_heading(_heading_level, _heading_text))
+                _newtoc.append(Heading(_heading_level, _match.group(2), n + 1))
         return _newtoc
 
     # #### RESTRUCTUREDTEXT
 
-    def _process_restructuredtext(self, data: str) -> list:
+    def _process_restructuredtext(self, data: str) -> list[Heading]:
         _newtoc = []
         # match the line above a streak of "#" (chapters), "*" (sections), etc., avoiding '"""' heredocs (min 4)
-        _pattern = re.compile(
-            r"(?:[#\*=\-\^~]{2,}|[\"]{4,}|\n)[ \t]*(?!\.\.)(.+)\n[ \t]*([#\*=\-\^~]{2,}|[\"]{4,})\n",
-            re.MULTILINE,
-        )
+        _regex = self._regex("restructuredtext")
         _fromLastMatch = 0
         n = 1
         # https://devguide.python.org/documentation/markup/#sections
         _levels = {"#": 1, "*": 2, "=": 3, "-": 4, "~": 5, "^": 5, '"': 6}
-        for _match in _pattern.finditer(data):
+        for _match in _regex.finditer(data):
             _heading_text = _match.group(1)
             _symbol = _match.group(2)[:1]
             _heading_level = _levels.get(_symbol, 1)
-            if self.lineNumbers:
-                # start counting from _heading_text, not optional overline
-                _untilCurrentMatch = _match.start(1)
-                n += data.count("\n", _fromLastMatch, _untilCurrentMatch)
-                _heading_text = _heading_text + " " + str(n)
-                # update with the position of the current match
-                _fromLastMatch = _untilCurrentMatch
-            _newtoc.append(self._add_heading(_heading_level, _heading_text))
+            # start counting from _heading_text, not optional overline
+            _untilCurrentMatch = _match.start(1)
+            n += data.count("\n", _fromLastMatch, _untilCurrentMatch)
+            # update with the position of the current match
+            _fromLastMatch = _untilCurrentMatch
+            _newtoc.append(Heading(_heading_level, _heading_text, n))
         return _newtoc
 
     # #### MAN PAGES
 
-    def _process_man(self, lines: list) -> list:
+    def _process_man(self, lines: Iterable[str]) -> list[Heading]:
         # parse perl files, reusing headings
         _newtoc = []
-        _pattern = re.compile(r'^\.(T[Hh]|S[HhSs]) "?(\w+?(?:\s\w+?)*)"?(\s|$)')
+        _regex = self._regex("man")
         _levels = {"TH": 1, "Th": 1, "SH": 2, "Sh": 2, "SS": 3, "Ss": 3}
         for n, line in enumerate(lines):
-            _match = _pattern.match(line)
+            _match = _regex.match(line)
             if _match:
                 _heading_level = _levels.get(_match.group(1), 1)
-                _heading_text = (
-                    f"{_match.group(2)} {n+1}" if self.lineNumbers else _match.group(2)
-                )
-                _newtoc.append(self._add_heading(_heading_level, _heading_text))
+                _newtoc.append(Heading(_heading_level, _match.group(2), n + 1))
         return _newtoc
 
     # #### PERL
 
     # https://perldoc.perl.org/perlpod
-    def _process_perl(self, lines: list) -> list:
+    def _process_perl(self, lines: Iterable[str]) -> list[Heading]:
         # parse perl files, reusing headings
         _newtoc = []
-        _pattern = re.compile(r"^=head(\d) (.*)$")
+        _regex = self._regex("perl")
         for n, line in enumerate(lines):
-            _match = _pattern.match(line)
+            _match = _regex.match(line)
             if _match:
                 _heading_level = int(_match.group(1))
-                _heading_text = (
-                    f"{_match.group(2)} {n+1}" if self.lineNumbers else _match.group(2)
-                )
-                _newtoc.append(self._add_heading(_heading_level, _heading_text))
+                _newtoc.append(Heading(_heading_level, _match.group(2), n + 1))
         # print(_newtoc)
         return _newtoc
 
     # #### GENERIC
 
-    def _process_generic(self, lines: list) -> list:
+    def _process_generic(self, lines: Iterable[str]) -> list[Heading]:
         _newtoc = []
         # using groups to capture the count of '#'
-        _pattern = re.compile(
-            rf"^(?:\t| )*{re.escape(self.character)} (#{{64}}|#{{32}}|#{{16}}|#{{8}}|#{{4}}|#{{2}}) (.*)$"
-        )
+        _regex = self._regex("generic", self.character)
+        _decorations = language(self.extension).decorations
         for n, comment in enumerate(lines):
             # print(comment, n)
-            _match = _pattern.match(comment)
+            _match = _regex.match(comment)
             if _match:
                 _heading_level = self.levels[len(_match.group(1))]
-                _heading_text = (
-                    f"{_match.group(2)} {n+1}" if self.lineNumbers else _match.group(2)
-                )
+                _heading_text = _match.group(2)
                 # print(_heading_level)
                 # print(_heading_text)
+                # special post-processing for r
+                if _decorations:
+                    _heading_text = self._regex("decorations").sub("", _heading_text)
                 # removing .strip() for cobol files
-                _newtoc.append(self._add_heading(_heading_level, _heading_text))
+                _newtoc.append(Heading(_heading_level, _heading_text, n + 1))
                 # print(_newtoc)
-        # special post-processing for r
-        match self.extension:
-            case "r" | "rpres":
-                _newtoc = [re.sub(r" [#-=]{4,}", "", line) for line in _newtoc]
+        return _newtoc
+
+    def _scan_generic(self, f: TextIO) -> list[Heading]:
+        # same as _process_generic, but memory-maps the file and searches it with a single bytes regex
+        # only the matched headings are decoded, lines are numbered by counting line boundaries between matches
+        # "\r\n" and "\r" end lines as well, like when the file is read as text
+        _newtoc: list[Heading] = []
+        # empty files cannot be mapped
+        if os.fstat(f.fileno()).st_size == 0:
+            return _newtoc
+        _regex = self._regex("generic_buffer", self.character, True)
+        _decorations = language(self.extension).decorations
+        # count newlines in bounded slices, so that sparse headings do not copy the whole file at once
+        _window = 16 * 1024 * 1024
+        # imported here, as only large files are scanned
+        import mmap
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as _buffer:
+            # most files only use "\n", which is counted in a single pass
+            _carriage = _buffer.find(b"\r") != -1
+
+            def _lines(start: int, end: int) -> int:
+                _slice = _buffer[start:end]
+                if not _carriage:
+                    return _slice.count(b"\n")
+                return _slice.count(b"\n") + _slice.count(b"\r") - _slice.count(b"\r\n")
+
+            n = 1
+            _last = 0
+            for _match in _regex.finditer(_buffer):
+                # comments after code or text are not headings
+                _start = _match.start()
+                if _start and _buffer[_start - 1 : _start] not in (b"\n", b"\r"):
+                    _start = _buffer.rfind(b"\n", 0, _start) + 1
+                    if _carriage:
+                        _start = max(
+                            _start, _buffer.rfind(b"\r", 0, _match.start()) + 1
+                        )
+                    if _buffer[_start : _match.start()].strip(b"\t "):
+                        continue
+                while _start - _last > _window:
+                    # never split a "\r\n" between two windows
+                    _end = _last + _window
+                    _end += _buffer[_end - 1 : _end + 1] == b"\r\n"
+                    n += _lines(_last, _end)
+                    _last = _end
+                n += _lines(_last, _start)
+                _last = _start
+                _heading_level = self.levels[len(_match.group(1))]
+                # invalid utf-8 is reported as binary, like when reading the file as text
+                _heading_text = _match.group(2).decode("utf-8")
+                if _decorations:
+                    _heading_text = self._regex("decorations").sub("", _heading_text)
+                _newtoc.append(Heading(_heading_level, _heading_text, n))
         return _newtoc
 
     # #### PRETTIFY CONNECTORS
 
-    def _prettify_connectors(self, newtoc: list) -> list:
-        # add other unicode box drawing symbols to prettify the tree structure
-        # "┐" is added to every heading except the last one. to calculate its position
-        # "├" replaces "└" for every siblings at the same level, except the last one
-        # "│" is added to connect lower siblings to upper siblings with children. to avoid adding it multiple times at every line, we need to reverse the list
-        # print(newtoc)
-        if newtoc:
-            # process the list in reverse order, removing empty elements
-            _headings: list[str] = list(filter(None, newtoc[::-1]))
-            # print(_headings, file=sys.stderr)
-            # for each line store: int_position_of_match: bool_parent_has_not_yet_been_encountered
-            # int_position_of_match is 3x the heading level
-            _flags: dict[int, bool] = {}
-            _pattern = re.compile(r"[└├]")
-            for index, heading in enumerate(_headings):
-                # "├": first level, "└": other levels
-                # print(f"Original line: '{heading}'")
-                # skip empty lines (due to --level)
-                match_heading = re.search(_pattern, heading)
-                if match_heading is not None:
-                    # save the position of the match
-                    i = match_heading.start()
-                    # for the first heading of each level do nothing, as it is the last sibling of that level
-                    # if current level is true, it means this heading is not the last sibling, therefore add "├" to connect to siblings below
-                    if _flags.get(i, False):
-                        heading = heading[:i] + "├" + heading[i + 1 :]
-                        # print('Line after "├": ', heading)
-                        # print('Dict after "├": ', dict(sorted(_flags.items())))
-                    # print(" ")
-                    # flag the current level to True, to indicate we are still operating at this level
-                    _flags[i] = True
-                    # set position of the child level
-                    c = i + 3
-                    # if child level is True, it means that now we are operating at a level with children,
-                    # therefore add "┐" to connect to the first child
-                    # this c flag is set to True with _flags[i] = True if we descended again to the child level, e.g. BEGIN H1 H2 H3 H2 H3 END
-                    # print(_flags)
-                    if _flags.get(c, False):
-                        heading = heading[:c] + "┐" + heading[c + 1 :]
-                        # print('Line after "┐": ', heading)
-                    # print('Dict after "┐": ', dict(sorted(_flags.items())))
-                    # print(" ")
-                    # set eventual child level to False, because if it was True we just connected to the first child with "┐",
-                    # and if it was False a previous sibling connected to the first child
-                    _flags[c] = False
-                    # the following code section is not triggered for simple "stairs" table of contents, e.g. BEGIN H1, H2, H3, H3, H4 END
-                    # however, if we have a higher heading level after a lower one, e.g. BEGIN H1, H2, H3, H2 END
-                    # in the example above, the second H2 should be vertically connected with "│" to the first H2
-                    # this affects H3, which should also be added a "│", and it also affects the first H2, which should replace its "└" with "├"
-                    # for H3, this is done now, for the first H2, it is done via flag the next iteration of 'for index, heading in enumerate(_lines)'
-                    # in BEGIN H1, H2, H3, H4, H2 END, H3 is modified once, but H4 is modified with two parallel "│"
-                    # start from the parent level, then go back right-to-left at intervals of 3, until position 4
-                    for p in range(i - 3, 4, -3):
-                        # if a parent level (15) is True, it means that we should vertically connect that level with "│"
-                        if _flags.get(p, False):
-                            # print("Adding '│' to ", heading)
-                            heading = heading[:p] + "│" + heading[p + 1 :]
-                            # print('Line after "│": ', heading)
-                            # print('Dict after "│": ', dict(sorted(_flags.items())))
-                    # print(" ")
-                    # replace the original heading with the modified one
-                    _headings[index] = heading
-                    # reverse before returning
-            _tocBody = _headings[::-1]
-        else:
-            _tocBody = []
-        # print(_tocBody)
+    def _prettify_connectors(self, newtoc: list[Heading]) -> list:
+        # render the headings as a tree with unicode box drawing symbols, in a single bottom-up pass
+        # a branch at some level is still open if the closest heading below, among that level and its parent level, is at that level
+        # "├" connects a heading to a sibling below, otherwise the branch ends with "└"
+        # "┐" connects a heading to its first child, one level below
+        # "│" connects a parent level to its siblings below, passing by the current heading
+        if not newtoc:
+            return []
+        _character = self.character
+        _open = [False] * (max(_heading.level for _heading in newtoc) + 2)
+        _tocBody = []
+        for _heading in reversed(newtoc):
+            _level = max(_heading.level, 1)
+            _child = "┐" if _open[_level + 1] else " "
+            if _level == 1:
+                _tocBody.append(f"{_character} ├──{_child}{_heading.text}")
+            else:
+                _parents = "".join(
+                    "│  " if _open[_parent] else "   " for _parent in range(2, _level)
+                )
+                _sibling = "├" if _open[_level] else "└"
+                _tocBody.append(
+                    f"{_character} │  {_parents}{_sibling}──{_child}{_heading.text}"
+                )
+            # the branch at this level is now open, and a new one starts for its children
+            _open[_level] = True
+            _open[_level + 1] = False
+        _tocBody.reverse()
         return _tocBody
 
     # ################ TOC INPUT
 
     def _read_file(self) -> str:
-        # read file content and process it accordingly
+        # return the in-memory document, loading it from disk or stdin only the first time
+        # stdin can only be consumed once, so it must always go through this cache
+        if self._data is None:
+            # edited documents are only joined when needed
+            self._data = (
+                "".join(self._lines) if self._lines is not None else self._load_file()
+            )
+        return self._data
+
+    def _invalidate(self, data: str | None = None) -> None:
+        # called after a write: replace the document with what is now on disk,
+        # or drop it entirely so that the next _read_file() loads it again
+        self._data = data
+        self._lines = None
+        self._headings = None
+
+    @staticmethod
+    def _has_newline(line: str) -> bool:
+        # whether a line returned by _split_lines(data, True) ends with a line boundary
+        return line.endswith(("\n", "\r"))
+
+    @staticmethod
+    def _split_lines(data: str, keepends: bool = False) -> list[str]:
+        # every path numbers lines like editors and open() do, so that "\x0c" or "\u2028" never start a new line
+        # files read from disk only contain "\n", which is split the fastest
+        if not keepends and "\r" not in data:
+            _lines = data.split("\n")
+            if _lines[-1] == "":
+                _lines.pop()
+            return _lines
+        _lines = _pattern("lines").findall(data)
+        return _lines if keepends else [_line.rstrip("\r\n") for _line in _lines]
+
+    def _load_file(self) -> str:
+        # read the whole file content
+        with self._phase("read"):
+            return self._read_input(lambda f: f.read(), "")
+
+    def _read_input(self, read: Callable[[TextIO], T], default: T) -> T:
+        # open file or stdin and process it accordingly
         # display alert for common errors
-        _data = ""
+        _data = default
         try:
             if self.inputFile == Path("-"):
-                _data = sys.stdin.read()
+                _data = read(sys.stdin)
             else:
                 with open(self.inputFile, "r") as f:
-                    _data = f.read()
+                    self._count("bytes", os.fstat(f.fileno()).st_size)
+                    _data = read(f)
         except FileNotFoundError:
             (
-                print(f'Skipping non-existing "{self.inputFile}"', file=sys.stderr)
+                self._log(f'Skipping non-existing "{self.inputFile}"')
                 if self.err is None
                 else None
             )
-            _data = ""
+            _data = default
             self.err = "notfound"
         except PermissionError:
             (
-                print(f'Skipping read-protected "{self.inputFile}"', file=sys.stderr)
+                self._log(f'Skipping read-protected "{self.inputFile}"')
                 if self.err is None
                 else None
             )
-            _data = ""
+            _data = default
             self.err = "read"
         except IsADirectoryError:
             (
-                print(f'Skipping directory "{self.inputFile}"', file=sys.stderr)
+                self._log(f'Skipping directory "{self.inputFile}"')
                 if self.err is None
                 else None
             )
-            _data = ""
+            _data = default
             self.err = "directory"
         except UnicodeDecodeError:
             (
-                print(f'Skipping binary "{self.inputFile}"', file=sys.stderr)
+                self._log(f'Skipping binary "{self.inputFile}"')
                 if self.err is None
                 else None
             )
-            _data = ""
+            _data = default
             self.err = "binary"
         except BaseException:
             (
-                print(
-                    f'Unknown error while reading "{self.inputFile}"', file=sys.stderr
-                )
+                self._log(f'Unknown error while reading "{self.inputFile}"')
                 if self.err is None
                 else None
             )
-            _data = ""
+            _data = default
             self.err = "unknownr"
         finally:
             return _data
+
+    # ################ RECORDS
+
+    def _line_offsets(self, lines: list[int]) -> dict[int, int]:
+        # offset in bytes of the beginning of these sorted lines, split and numbered from 1 like the parsers do
+        if not lines:
+            return {}
+        _data = self._read_file()
+        _starts = list(accumulate(map(len, self._split_lines(_data, True)), initial=0))
+        _offsets = {}
+        # characters and bytes only differ outside of ascii, encoding the text between lines as it would be on disk
+        _ascii = _data.isascii()
+        _encoding = locale.getpreferredencoding(False)
+        _char = 0
+        _byte = 0
+        for _line in lines:
+            _next = _starts[min(_line, len(_starts)) - 1]
+            _byte += (
+                _next - _char if _ascii else len(_data[_char:_next].encode(_encoding))
+            )
+            _char = _next
+            _offsets[_line] = _byte
+        return _offsets
+
+    # ################ REPORTING
+
+    def _log(self, message: str) -> None:
+        # tell the user what happened to this file, or let the caller decide
+        if self.quiet:
+            self.messages.append(message)
+        else:
+            print(message, file=sys.stderr)
+
+    # ################ PROFILING
+
+    def _phase(self, name: str) -> AbstractContextManager:
+        # time a step of processing this file, if profiling
+        return nullcontext() if self.profile is None else self.profile.phase(name)
+
+    def _count(self, name: str, n: int) -> None:
+        if self.profile is not None:
+            self.profile.count(name, n)
+
+    def _regex(
+        self, name: str, character: str = "", binary: bool = False
+    ) -> re.Pattern:
+        # the shared compiled pattern, counting its calls if profiling
+        _regex = _pattern(name, character, binary)
+        if self.profile is None:
+            return _regex
+        from toc.profiling import CountingPattern
+
+        # only provides the methods used by the parsers
+        return cast(re.Pattern, CountingPattern(_regex, self.profile))
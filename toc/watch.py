@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+
+# ┌───────────────────────────────────────────────────────────────┐
+# │ Contents of watch.py                                          │
+# ├───────────────────────────────────────────────────────────────┘
+# │
+# ├── MODULES
+# ├── CONSTANTS
+# ├── CLASSES
+# ├── FUNCTIONS
+# │
+# └───────────────────────────────────────────────────────────────
+
+# ################################################################ MODULES
+
+# native notifications on linux, without dependencies
+import ctypes
+import ctypes.util
+import struct
+import select
+
+# stat, realpath and reading events
+import os
+
+# polling and debouncing
+import time
+
+# files
+from pathlib import Path
+
+# callbacks and stopping from another thread
+from threading import Event
+from typing import Callable, Iterable
+
+# ################################################################ CONSTANTS
+
+# inotify events of a directory telling that one of its files may have changed
+# files saved by editors or by Toc are often replaced by a rename rather than written in place
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# wd, mask, cookie, length of the name
+EVENT = struct.Struct("iIII")
+
+# ################################################################ CLASSES
+
+
+class Poller:
+    # fallback for platforms without native notifications, every file may have changed after each interval
+    def __init__(self, interval: float = 0.5):
+        self.interval: float = interval
+        self.paths: set[Path] = set()
+
+    def watch(self, paths: Iterable[Path]) -> None:
+        self.paths = set(paths)
+
+    def wait(self, timeout: float) -> set[Path]:
+        time.sleep(min(self.interval, timeout))
+        return self.paths
+
+    def close(self) -> None:
+        pass
+
+
+class Inotify:
+    # watch the directories of the files rather than the files, whose inode changes when they are replaced
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd: int = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.directories: dict[str, int] = {}
+        # (watch descriptor, name) of the real file, and the path given by the user
+        self.targets: dict[tuple[int, bytes], Path] = {}
+
+    def watch(self, paths: Iterable[Path]) -> None:
+        self.targets = {}
+        for _path in paths:
+            # Toc writes to the target of symbolic links
+            _directory, _name = os.path.split(os.path.realpath(_path))
+            if _directory not in self.directories:
+                _wd = self.libc.inotify_add_watch(
+                    self.fd, os.fsencode(_directory), MASK
+                )
+                if _wd < 0:
+                    continue
+                self.directories[_directory] = _wd
+            self.targets[(self.directories[_directory], os.fsencode(_name))] = _path
+
+    def wait(self, timeout: float) -> set[Path]:
+        # paths of the files touched by the events received before the timeout
+        _paths: set[Path] = set()
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return _paths
+        while True:
+            try:
+                _buffer = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return _paths
+            _offset = 0
+            while _offset < len(_buffer):
+                _wd, _mask, _cookie, _length = EVENT.unpack_from(_buffer, _offset)
+                _offset += EVENT.size
+                _name = _buffer[_offset : _offset + _length].rstrip(b"\0")
+                _offset += _length
+                if _mask & IN_Q_OVERFLOW:
+                    # events were lost, anything may have changed
+                    _paths.update(self.targets.values())
+                elif (_wd, _name) in self.targets:
+                    _paths.add(self.targets[(_wd, _name)])
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+# ################################################################ FUNCTIONS
+
+
+def backend(interval: float = 0.5) -> "Inotify | Poller":
+    # native notifications if available, polling otherwise
+    try:
+        return Inotify()
+    except (OSError, AttributeError, TypeError):
+        return Poller(interval)
+
+
+def signature(path: Path) -> tuple[int, int, int] | None:
+    # files are processed again only if one of these changed, None if the file is missing
+    try:
+        return stat_signature(os.stat(path))
+    except OSError:
+        return None
+
+
+def stat_signature(stat: os.stat_result) -> tuple[int, int, int]:
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def watch(
+    files: list[Path],
+    process: Callable[[list[Path]], "dict[Path, os.stat_result] | None"],
+    lists: list[Path] | None = None,
+    expand: Callable[[], list[Path]] | None = None,
+    delay: float = 0.2,
+    notifier: "Inotify | Poller | None" = None,
+    stop: Event | None = None,
+) -> None:
+    # process files again after they change, until interrupted or stopped
+    # process returns the stats of the files it wrote, so that these writes are not taken as changes
+    # changes are processed together once no file has changed for "delay" seconds
+    # changes to list files expand them again, and newly listed files are processed
+    _notifier = notifier or backend()
+    _lists = lists or []
+    # signatures after the last time each file was processed, including the writes of process
+    _processed = {_path: signature(_path) for _path in [*files, *_lists]}
+    # latest signatures, to tell whether a burst of changes is over
+    _seen = dict(_processed)
+    _files = list(files)
+    _pending: set[Path] = set()
+    _notifier.watch([*_files, *_lists])
+    try:
+        while stop is None or not stop.is_set():
+            _changed = False
+            for _path in _notifier.wait(delay if _pending else 0.5):
+                _signature = signature(_path)
+                if _signature == _seen.get(_path):
+                    continue
+                _seen[_path] = _signature
+                _changed = True
+                # a file saved twice may end up identical to what was processed
+                if _signature != _processed.get(_path):
+                    _pending.add(_path)
+                else:
+                    _pending.discard(_path)
+            if not _pending or _changed:
+                continue
+            _todo = [
+                _path
+                for _path in _files
+                if _path in _pending and _seen[_path] is not None
+            ]
+            if expand is not None and any(_path in _pending for _path in _lists):
+                _expanded = expand()
+                _todo += [_path for _path in _expanded if _path not in _processed]
+                for _path in _todo:
+                    _seen.setdefault(_path, signature(_path))
+                _files = _expanded
+                _notifier.watch([*_files, *_lists])
+            _written = process(_todo) if _todo else {}
+            # files saved while being processed differ from both signatures, and are processed again
+            for _path in [*_todo, *(_path for _path in _pending if _path in _lists)]:
+                if _written is None:
+                    # the writes are unknown, the file is taken as it is now
+                    _processed[_path] = signature(_path)
+                elif _path in _written:
+                    _processed[_path] = stat_signature(_written[_path])
+                else:
+                    _processed[_path] = _seen[_path]
+            _pending.clear()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        _notifier.close()